@@ -0,0 +1,120 @@
+"""
+Rhinovate memory admission: keep concurrent stages within a memory budget.
+Each stage's peak memory is estimated before it starts: the sanitizer from the PLY
+header (vertex / face counts, k-NN size, Python voxel settings), the Blender stage
+from the sanitized OBJ's size and the Blender voxel settings. MemoryGate admits a
+stage only while the estimated total of running stages stays within the budget;
+waiting stages are admitted smallest first. A stage larger than the whole budget
+still runs, alone, so nothing waits forever.
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+import ply_stream
+
+_MB = 1 << 20
+
+# Measured on the sanitizer (peak RSS, point clouds, k_neighbors 20): ~130 MB of
+# interpreter + numpy/scipy/sklearn/trimesh, then ~550 B per point.
+SANITIZE_BASE_MB = 150
+LOAD_BYTES_PER_POINT = 144  # parsed rows, float64 vertices and their copies
+KNN_BYTES_PER_NEIGHBOUR = 16  # float64 distance + int64 index per (point, neighbour)
+CLUSTER_BYTES_PER_POINT = 100  # DBSCAN neighbourhoods and labels
+BYTES_PER_FACE = 200  # faces, edges and adjacency for mesh filtering / repair
+BRICK_BYTES_PER_CELL = 64  # sparse brick volume, per voxel_amount² surface cell
+BLENDER_BASE_MB = 350
+BLENDER_BYTES_PER_OBJ_BYTE = 6  # imported mesh relative to the OBJ text
+BLENDER_VOLUME_BYTES_PER_CELL = 256  # Points→Volume grid + meshed result
+
+
+def sanitize_estimate_mb(path: str, config: dict) -> float:
+    """Estimated peak memory of the sanitize stage for one scan, in MB (also covers its preview).
+
+    Falls back to the file size when the header cannot be read (e.g. not a PLY yet).
+    """
+    try:
+        header = ply_stream.read_header(path)
+        points, faces = header.vertex_count, header.face_count
+    except (OSError, ply_stream.PlyFormatError):
+        points, faces = os.path.getsize(path) // 15 if os.path.isfile(path) else 0, 0
+    filtering = config.get("filtering", {})
+    pipeline = config.get("pipeline", {})
+    per_point = LOAD_BYTES_PER_POINT
+    if filtering.get("enable", True) and not faces:
+        per_point += (int(filtering.get("k_neighbors", 20)) + 1) * KNN_BYTES_PER_NEIGHBOUR
+        if filtering.get("keep_largest_cluster", True):
+            per_point += CLUSTER_BYTES_PER_POINT
+    total = points * per_point + faces * BYTES_PER_FACE
+    if pipeline.get("use_voxelization") and pipeline.get("voxel_backend", "blender") == "python":
+        amount = int(pipeline.get("voxel_amount", 64))
+        total += amount * amount * BRICK_BYTES_PER_CELL
+    return SANITIZE_BASE_MB + total / _MB
+
+
+def morph_estimate_mb(obj_path: str, config: dict) -> float:
+    """Estimated peak memory of the Blender stage for a sanitized OBJ, in MB."""
+    pipeline = config.get("pipeline", {})
+    size = os.path.getsize(obj_path) if os.path.isfile(obj_path) else 0
+    total = size * BLENDER_BYTES_PER_OBJ_BYTE
+    if pipeline.get("use_voxelization") and pipeline.get("voxel_backend", "blender") != "python":
+        amount = int(pipeline.get("voxel_amount", 64))
+        total += amount * amount * BLENDER_VOLUME_BYTES_PER_CELL
+    return BLENDER_BASE_MB + total / _MB
+
+
+class MemoryGate:
+    """Admit work while the estimated memory in use stays within budget_mb (0 = no limit).
+
+    Thread-safe; acquire() blocks until the caller is the smallest waiter and fits.
+    """
+
+    def __init__(self, budget_mb: float = 0):
+        self.budget_mb = float(budget_mb or 0)
+        self.in_use_mb = 0.0
+        self.running = 0
+        self.admitted = 0
+        self.blocked = 0  # admissions that had to wait
+        self.max_queue = 0
+        self.peak_mb = 0.0
+        self._waiting: list[tuple[float, int]] = []  # (estimate, ticket), smallest first
+        self._ticket = 0
+        self._open = False  # set by cancel_all()
+        self._cond = threading.Condition()
+
+    def _fits(self, mb: float) -> bool:
+        return self._open or not self.budget_mb or self.running == 0 or self.in_use_mb + mb <= self.budget_mb
+
+    def acquire(self, mb: float, on_wait=None) -> None:
+        """Block until mb can be admitted. on_wait(queue_depth, in_use_mb) is called once if it has to wait."""
+        with self._cond:
+            self._ticket += 1
+            entry = (mb, self._ticket)
+            self._waiting.append(entry)
+            self._waiting.sort()
+            if not (self._waiting[0] == entry and self._fits(mb)):
+                self.blocked += 1
+                self.max_queue = max(self.max_queue, len(self._waiting))
+                if on_wait is not None:
+                    on_wait(len(self._waiting), self.in_use_mb)
+                while not (self._waiting[0] == entry and self._fits(mb)):
+                    self._cond.wait()
+            self._waiting.remove(entry)
+            self.in_use_mb += mb
+            self.running += 1
+            self.admitted += 1
+            self.peak_mb = max(self.peak_mb, self.in_use_mb)
+            self._cond.notify_all()
+
+    def release(self, mb: float) -> None:
+        with self._cond:
+            self.in_use_mb = max(0.0, self.in_use_mb - mb)
+            self.running -= 1
+            self._cond.notify_all()
+
+    def cancel_all(self) -> None:
+        """Admit every waiter regardless of budget (used when the run is interrupted)."""
+        with self._cond:
+            self._open = True
+            self._cond.notify_all()
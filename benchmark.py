@@ -0,0 +1,196 @@
+"""
+Rhinovate end-to-end benchmark: synthetic scans through run_all.py with a Blender stand-in.
+Generates a batch of synthetic LiDAR-like scans in a scratch project root, runs
+run_all.py on them with blender_standin.py as "Blender", then reports wall time,
+per-scan latency distribution, per-stage durations / queue waits (from the job
+ledger) and child-process startup cost (from the run's trace).
+
+Run: python benchmark.py [--scans 8] [--points 100000] [--sanitize-workers 2] [--morph-workers 1]
+                         [--standin-delay 0.5] [--root DIR] [--keep] [--json results.json]
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import trimesh
+
+import job_ledger
+import run_all
+
+STANDIN_SCRIPT = "blender_standin.py"
+
+
+def synthetic_scan(n_points: int, background: float, seed: int) -> np.ndarray:
+    """Face-like noisy hemisphere shell (r≈0.12) plus uniform background clutter."""
+    rng = np.random.default_rng(seed)
+    face = rng.normal(size=(n_points, 3))
+    face /= np.linalg.norm(face, axis=1, keepdims=True)
+    face[:, 2] = np.abs(face[:, 2])
+    face *= 0.12 + rng.normal(scale=0.001, size=(n_points, 1))
+    clutter = rng.uniform(-1.0, 1.0, size=(int(n_points * background), 3))
+    return np.vstack([face, clutter])
+
+
+def _stats(values: list[float]) -> str:
+    if not values:
+        return "-"
+    v = np.asarray(values)
+    return (
+        f"n={len(v):<3} mean {v.mean():6.2f}s  p50 {np.percentile(v, 50):6.2f}s  "
+        f"p95 {np.percentile(v, 95):6.2f}s  max {v.max():6.2f}s"
+    )
+
+
+def _stage_report(rows: list[dict]) -> dict:
+    """Per-stage durations and queue waits, and per-scan latency, from ledger rows."""
+    by_scan: dict[str, dict[str, dict]] = {}
+    for row in rows:
+        by_scan.setdefault(row["scan"], {})[row["stage"]] = row
+    stages = [s for s in run_all.STAGE_CONFIG_SECTIONS if any(s in v for v in by_scan.values())]
+    durations = {s: [] for s in stages}
+    waits = {s: [] for s in stages}
+    latencies = []
+    for scan_rows in by_scan.values():
+        ready = min(r["queued_at"] for r in scan_rows.values() if r["queued_at"])
+        for stage in stages:
+            row = scan_rows.get(stage)
+            if not row or row["state"] != "done":
+                continue
+            durations[stage].append(row["duration"])
+            waits[stage].append(max(0.0, row["started_at"] - ready))
+            ready = row["finished_at"]
+        finished = [r["finished_at"] for r in scan_rows.values() if r["finished_at"]]
+        if finished:
+            latencies.append(max(finished) - min(r["queued_at"] for r in scan_rows.values()))
+    return {"stages": stages, "durations": durations, "waits": waits, "latencies": latencies}
+
+
+def _startup_report(trace_dir: str) -> dict[str, list[float]]:
+    """Child startup spans (spawn → first line of work) by process kind, from the newest trace."""
+    traces = sorted(glob.glob(os.path.join(trace_dir, "*.json")), key=os.path.getmtime)
+    if not traces:
+        return {}
+    with open(traces[-1], "r", encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    names = {e["pid"]: e["args"]["name"].rsplit(" (", 1)[0] for e in events if e.get("ph") == "M"}
+    startup: dict[str, list[float]] = {}
+    for e in events:
+        if e.get("ph") == "X" and e["name"] == "startup":
+            startup.setdefault(names.get(e["pid"], "?"), []).append(e["dur"] / 1e6)
+    return startup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rhinovate end-to-end pipeline benchmark.")
+    parser.add_argument("--scans", type=int, default=8)
+    parser.add_argument("--points", type=int, default=100_000, help="face points per scan")
+    parser.add_argument("--background", type=float, default=0.05, help="clutter points as a fraction of --points")
+    parser.add_argument("--sanitize-workers", type=int)
+    parser.add_argument("--morph-workers", type=int)
+    parser.add_argument("--standin-delay", type=float, default=0.5, help="seconds the stand-in sleeps per morph")
+    parser.add_argument("--root", help="scratch project root (default: a new temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch root")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root) if args.root else tempfile.mkdtemp(prefix="rhinovate_bench_")
+    config = run_all.load_config(run_all.CODE_DIR)
+    config["folders"] = {"incoming": "1_Incoming", "processing": "2_Processing", "outgoing": "3_Outgoing"}
+    config["blender_path"] = os.path.join(run_all.CODE_DIR, STANDIN_SCRIPT)
+    config["trace"] = {"enable": True, "dir": ".trace"}
+    config["benchmark"] = {"standin_delay_s": args.standin_delay}
+    orch = config.setdefault("orchestrator", {})
+    orch["ledger"] = "pipeline_jobs.sqlite3"
+    if args.sanitize_workers:
+        orch["sanitize_workers"] = args.sanitize_workers
+    if args.morph_workers:
+        orch["morph_workers"] = args.morph_workers
+
+    print("==========================================")
+    print("RHINOVATE BENCHMARK")
+    print("==========================================\n")
+    print(f"Root: {root}")
+    try:
+        for sub in ("1_Incoming", "2_Processing", "3_Outgoing", ".trace"):
+            shutil.rmtree(os.path.join(root, sub), ignore_errors=True)
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        for stale in glob.glob(os.path.join(root, "pipeline_jobs.sqlite3*")):
+            os.remove(stale)
+        with open(os.path.join(root, run_all.CONFIG_PATH), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+        t0 = time.perf_counter()
+        for i in range(args.scans):
+            pts = synthetic_scan(args.points, args.background, seed=i)
+            trimesh.PointCloud(pts).export(os.path.join(root, "1_Incoming", f"bench_{i:03d}.ply"))
+        print(f"Generated {args.scans} scan(s) x {int(args.points * (1 + args.background))} points "
+              f"({time.perf_counter() - t0:.1f}s)")
+        print(f"Workers: sanitize x{orch.get('sanitize_workers', 1)}, morph x{orch.get('morph_workers', 1)}; "
+              f"stand-in delay {args.standin_delay}s\n")
+
+        t0 = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.join(run_all.CODE_DIR, "run_all.py"), "--root", root],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+        )
+        wall = time.perf_counter() - t0
+        if result.returncode != 0:
+            print("[WARN] run_all.py exited non-zero; last output:")
+            for line in result.stdout.rstrip().splitlines()[-15:]:
+                print(f"   {line}")
+
+        ledger = job_ledger.JobLedger(job_ledger.ledger_path(root, config))
+        rows = ledger.query()
+        ledger.close()
+        report = _stage_report(rows)
+        startup = _startup_report(os.path.join(root, ".trace"))
+        done = len(report["latencies"])
+
+        print("==========================================")
+        print("RESULTS")
+        print("==========================================")
+        print(f"   Wall: {wall:.2f}s for {args.scans} scan(s), {done} finished "
+              f"({args.scans / wall:.2f} scans/s)")
+        print(f"   Latency   {_stats(report['latencies'])}")
+        for stage in report["stages"]:
+            print(f"   {stage:<17} run  {_stats(report['durations'][stage])}")
+            print(f"   {'':<17} wait {_stats(report['waits'][stage])}")
+        for kind, values in sorted(startup.items()):
+            print(f"   startup {kind:<24} {_stats(values)}")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({
+                    "scans": args.scans,
+                    "points": args.points,
+                    "workers": {"sanitize": orch.get("sanitize_workers", 1), "morph": orch.get("morph_workers", 1)},
+                    "standin_delay_s": args.standin_delay,
+                    "wall_s": wall,
+                    "exit_code": result.returncode,
+                    "latency_s": report["latencies"],
+                    "stage_s": report["durations"],
+                    "wait_s": report["waits"],
+                    "startup_s": startup,
+                }, f, indent=2)
+            print(f"[OK] Results: {args.json}")
+    finally:
+        if not args.keep and not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+    if result.returncode != 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
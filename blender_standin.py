@@ -0,0 +1,74 @@
+"""
+Rhinovate Blender stand-in: a lightweight "blender" for benchmarks and local tests.
+Accepts the same command line run_all.py gives Blender
+(--background --python pipeline_hd.py -- scan.obj [--preview]) and honours the same
+file contract: reads the OBJ from the processing folder and writes *_healed.glb
+(or *_preview.glb) to the outgoing folder. No morph is applied; the mesh (or,
+for a point-cloud OBJ, the points) is re-exported with trimesh. benchmark.standin_delay_s adds a fixed sleep to model
+Blender's own work. Use it via blender_path, or --blender on run_all / ingest_server.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+
+import trimesh
+
+import lease_queue
+import tracing
+
+CONFIG_NAME = "config.json"
+
+
+def _fail(msg: str) -> None:
+    print(msg)
+    sys.exit(1)
+
+
+def main() -> None:
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    names = [a for a in args if not a.startswith("--")]
+    preview = "--preview" in args
+    if not names:
+        _fail("[FAIL] Stand-in needs a scan name after --")
+
+    root = os.environ.get("RHINOVATE_PROJECT_ROOT", os.getcwd())
+    path = os.path.join(root, CONFIG_NAME)
+    if not os.path.isfile(path):
+        _fail(f"[FAIL] Config not found: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    folders = config.get("folders", {})
+    input_path = os.path.join(root, folders.get("processing", "2_Processing"), names[0])
+    output_dir = os.path.join(root, folders.get("outgoing", "3_Outgoing"))
+    os.makedirs(output_dir, exist_ok=True)
+    tracing.process_name("blender stand-in" + (" preview" if preview else ""))
+
+    print(f"Loading: {names[0]} (stand-in)")
+    with tracing.span("import", file=names[0]):
+        try:
+            # A vertex-only OBJ (point-cloud sanitizer output) loads as a PointCloud;
+            # force="mesh" would turn it into an empty Trimesh.
+            mesh = trimesh.load(input_path)
+            if isinstance(mesh, trimesh.Scene):
+                mesh = trimesh.load(input_path, force="mesh")
+        except Exception as e:
+            _fail(f"[FAIL] Import failed: {e}")
+    if len(mesh.vertices) == 0:
+        _fail("[FAIL] Mesh has no vertices - cannot export!")
+
+    delay = float(config.get("benchmark", {}).get("standin_delay_s", 0.0))
+    if delay > 0:
+        with tracing.span("simulated morph", seconds=delay):
+            time.sleep(delay)
+
+    out_name = names[0].replace(".obj", ".glb" if preview else "_healed.glb")
+    with tracing.span("export", file=out_name):
+        mesh.export(lease_queue.staged_path(os.path.join(output_dir, out_name)), file_type="glb")
+    print(f"[OK] Exported: {out_name} ({len(mesh.vertices)} vertices)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Rhinovate hole filling: close small holes in triangulated scans without a volume pass.
+Edges are counted with one np.unique over packed (min, max) vertex keys: an edge
+used by one face is a boundary edge, by more than two a non-manifold edge.
+Boundary edges are grouped into loops with csgraph connected components; loops of
+at most max_hole_edges edges are closed with a fan around their centroid, wound
+against the surrounding faces. A mesh with no boundary or non-manifold edges left
+is watertight and can skip voxelization; the sanitizer records that in a
+<stem>_mesh.json sidecar that pipeline_hd.py reads.
+"""
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+
+
+def edge_counts(faces: np.ndarray, n_vertices: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Directed face edges (3F, 2); per directed edge, how many faces share its undirected
+    edge; and the face count of every distinct undirected edge."""
+    edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).astype(np.int64)
+    keys = edges.min(axis=1) * n_vertices + edges.max(axis=1)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return edges, counts[inverse.ravel()], counts
+
+
+def boundary_loops(faces: np.ndarray, n_vertices: int) -> tuple[list[np.ndarray], int, int]:
+    """Simple boundary loops as ordered vertex arrays (in face-edge direction).
+
+    Also returns how many boundary components are not simple loops (a vertex where
+    two holes touch) and the number of non-manifold edges.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    edges, per_edge, counts = edge_counts(faces, n_vertices)
+    non_manifold = int(np.count_nonzero(counts > 2))
+    boundary = edges[per_edge == 1]
+    if len(boundary) == 0:
+        return [], 0, non_manifold
+
+    graph = coo_matrix((np.ones(len(boundary)), (boundary[:, 0], boundary[:, 1])), shape=(n_vertices, n_vertices))
+    _, labels = connected_components(graph, directed=False)
+    comp = labels[boundary[:, 0]]
+    out_degree = np.bincount(boundary[:, 0], minlength=n_vertices)
+    in_degree = np.bincount(boundary[:, 1], minlength=n_vertices)
+    bad = (out_degree[boundary[:, 0]] != 1) | (in_degree[boundary[:, 0]] != 1)
+    bad_comps = np.unique(comp[bad])
+    simple = ~np.isin(comp, bad_comps)
+
+    successor = np.full(n_vertices, -1, dtype=np.int64)
+    successor[boundary[simple, 0]] = boundary[simple, 1]
+    order = np.argsort(comp[simple], kind="stable")
+    starts = boundary[simple, 0][order]
+    splits = np.flatnonzero(np.diff(comp[simple][order])) + 1
+    loops = []
+    for members in np.split(starts, splits):
+        if len(members) == 0:
+            continue
+        loop = np.empty(len(members), dtype=np.int64)
+        v = members[0]
+        for i in range(len(members)):
+            loop[i] = v
+            v = successor[v]
+        loops.append(loop)
+    return loops, len(bad_comps), non_manifold
+
+
+def fill_holes(vertices: np.ndarray, faces: np.ndarray, max_hole_edges: int = 100):
+    """Close boundary loops of at most max_hole_edges edges.
+
+    Returns (vertices, faces, report); report has loops found, filled, left open,
+    non-manifold edges and whether the result is watertight.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    loops, tangled, non_manifold = boundary_loops(faces, len(vertices))
+    small = [loop for loop in loops if len(loop) <= max_hole_edges]
+
+    new_vertices, new_faces = [], []
+    next_index = len(vertices)
+    for loop in small:
+        nxt = np.roll(loop, -1)
+        if len(loop) == 3:
+            new_faces.append(loop[::-1][None, :])
+            continue
+        # Fan around the centroid; (next, current) reverses the surrounding faces' boundary edge.
+        new_vertices.append(vertices[loop].mean(axis=0))
+        new_faces.append(np.column_stack([nxt, loop, np.full(len(loop), next_index)]))
+        next_index += 1
+    if new_faces:
+        faces = np.vstack([faces, *new_faces])
+    if new_vertices:
+        vertices = np.vstack([vertices, np.array(new_vertices)])
+
+    open_loops = len(loops) - len(small) + tangled
+    report = {
+        "boundary_loops": len(loops) + tangled,
+        "holes_filled": len(small),
+        "open_loops": open_loops,
+        "non_manifold_edges": non_manifold,
+        "watertight": open_loops == 0 and non_manifold == 0,
+    }
+    return vertices, faces, report
+
+
+def is_watertight(faces: np.ndarray, n_vertices: int) -> bool:
+    """Every undirected edge shared by exactly two faces."""
+    if len(faces) == 0:
+        return False
+    _, _, counts = edge_counts(np.asarray(faces), n_vertices)
+    return bool(np.all(counts == 2))
+
+
+def report_path(obj_path: str) -> str:
+    """Sidecar next to a sanitized OBJ: <stem>_mesh.json."""
+    return os.path.splitext(obj_path)[0] + "_mesh.json"
+
+
+def read_report(obj_path: str) -> dict:
+    """The sanitizer's hole-filling report for an OBJ, or {} if there is none."""
+    try:
+        with open(report_path(obj_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,356 @@
+"""
+Rhinovate ingest service: direct PLY uploads from the iOS app over HTTP.
+A single-process asyncio server. Uploads are streamed to disk in chunks (never
+buffered whole), then each scan runs through the same sanitize → morph stages
+as run_all.py, with per-stage concurrency from the "orchestrator" section.
+While the body arrives it is also fed to an incremental PLY parser: a bad header
+is rejected before the rest is transferred, and the decoded vertices are handed
+to the sanitizer so it does not re-read the PLY.
+
+    POST /scans/<name>.ply[.gz]    upload body (Content-Length required) → 202 + job JSON
+    GET  /scans/<name>.ply         job status JSON
+    DELETE /scans/<name>.ply       cancel: stops the running stage, no further stages start
+    GET  /scans/<name>.ply/preview coarse *_preview.glb (when "preview" is enabled)
+    GET  /scans/<name>.ply/result  finished *_healed.glb
+    GET  /healthz
+
+Run: python ingest_server.py [--host 127.0.0.1] [--port 8765] [--root DIR] [--blender PATH]
+For local end-to-end tests, --blender may point at a stand-in .py script.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import ply_stream
+import run_all
+
+CHUNK_SIZE = 1 << 20
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*\.ply(\.gz|\.bz2|\.xz)?$")
+_REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    411: "Length Required",
+    413: "Payload Too Large",
+}
+_STAGE_OF_STATE = {"sanitizing": "sanitize", "morphing": "morph"}  # ledger stage a job state is running
+
+
+def _feed(parser: ply_stream.PlyStreamParser, decoder, chunk: bytes) -> None:
+    """Decompress (if needed) and parse one upload chunk."""
+    parser.feed(decoder.decompress(chunk) if decoder else chunk)
+
+
+@dataclass
+class IngestJob:
+    """Server-side view of one uploaded scan."""
+
+    scan: run_all.ScanJob
+    state: str = "uploading"
+    error: str | None = None
+    uploaded_bytes: int = 0
+    preparsed_vertices: int | None = None
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.scan.name,
+            "state": self.state,
+            "error": self.error,
+            "uploaded_bytes": self.uploaded_bytes,
+            "preparsed_vertices": self.preparsed_vertices,
+            "stage_times": {k: round(v, 3) for k, v in self.scan.stage_times.items()},
+            "preview": f"/scans/{self.scan.name}/preview" if self.scan.preview_ready else None,
+            "result": f"/scans/{self.scan.name}/result" if self.state == "done" else None,
+        }
+
+
+class IngestServer:
+    def __init__(self, ctx: run_all.RunContext):
+        self.ctx = ctx
+        orch = ctx.config.get("orchestrator", {})
+        ingest_cfg = ctx.config.get("ingest", {})
+        self.max_upload = int(ingest_cfg.get("max_upload_mb", 2048)) * (1 << 20)
+        self.stream_parse = bool(ingest_cfg.get("stream_parse", True))
+        self.max_vertices = ingest_cfg.get("max_vertices")
+        self.preview = bool(ctx.config.get("preview", {}).get("enable", False))
+        sanitize_workers = max(1, int(orch.get("sanitize_workers", 1)))
+        morph_workers = max(1, int(orch.get("morph_workers", 1)))
+        self._sanitize_slots = asyncio.Semaphore(sanitize_workers)
+        self._morph_slots = asyncio.Semaphore(morph_workers)
+        # Stages block a thread for their whole child process; uploads keep the
+        # default executor to themselves.
+        self._stage_pool = ThreadPoolExecutor(sanitize_workers + morph_workers, thread_name_prefix="stage")
+        self.jobs: dict[str, IngestJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def close(self) -> None:
+        self._stage_pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- pipeline ---------------------------------------------------------
+
+    async def _run_in_stage_pool(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._stage_pool, fn, *args)
+
+    async def _run_pipeline(self, job: IngestJob) -> None:
+        """Run the job's stages; an unexpected error fails the job instead of leaving it stuck."""
+        try:
+            await self._run_stages(job)
+        except Exception as e:
+            # The slots are released as the async with blocks unwind.
+            stage = _STAGE_OF_STATE.get(job.state)
+            if stage is not None:
+                job.scan.failed_stage = job.scan.failed_stage or stage
+                self.ctx.ledger.fail(job.scan.name, stage, f"error: {e}")
+            job.state, job.error = "failed", f"{stage or job.state} error: {e}"
+            print(f"[FAIL] {job.scan.name}: {job.error}")
+        finally:
+            if job.scan.finished is None:
+                job.scan.finished = time.perf_counter()
+            if job.scan.points_path:
+                try:
+                    os.remove(job.scan.points_path)
+                except FileNotFoundError:
+                    pass
+                job.scan.points_path = None
+
+    async def _run_stages(self, job: IngestJob) -> None:
+        ctx = self.ctx
+        async with self._sanitize_slots:
+            if self.preview:
+                job.state = "previewing"
+                await self._run_in_stage_pool(run_all.preview_scan, job.scan, ctx)
+            job.state = "sanitizing"
+            ok = await self._run_in_stage_pool(run_all.sanitize_scan, job.scan, ctx)
+        if job.scan.points_path:
+            os.remove(job.scan.points_path)
+            job.scan.points_path = None
+        if ok:
+            job.state = "queued_morph"
+            async with self._morph_slots:
+                job.state = "morphing"
+                ok = await self._run_in_stage_pool(run_all.morph_scan, job.scan, ctx)
+        if ok:
+            job.state = "done"
+        elif job.scan.cancelled:
+            job.state = "cancelled"
+        else:
+            job.state = "failed"
+            job.error = f"{job.scan.failed_stage} failed"
+
+    def _enqueue(self, job: IngestJob) -> None:
+        job.state = "queued"
+        for stage in run_all.job_stages(self.ctx.config):
+            self.ctx.ledger.enqueue(job.scan.name, stage)
+        task = asyncio.create_task(self._run_pipeline(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # --- HTTP -------------------------------------------------------------
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, body: bytes = b"", content_type: str = "application/json") -> None:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+        await self._send(writer, status, json.dumps(payload).encode("utf-8"))
+
+    async def _send_file(self, writer: asyncio.StreamWriter, path: str, content_type: str) -> None:
+        size = os.path.getsize(path)
+        head = (
+            f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {size}\r\n"
+            f'Content-Disposition: attachment; filename="{os.path.basename(path)}"\r\n'
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1"))
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _receive_upload(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, name: str, headers: dict
+    ) -> None:
+        if not _NAME_RE.match(name):
+            await self._send_json(writer, 400, {"error": "scan name must be a plain *.ply[.gz|.bz2|.xz] filename"})
+            return
+        existing = self.jobs.get(name)
+        if existing and existing.state not in ("done", "failed", "cancelled"):
+            await self._send_json(writer, 409, {"error": "scan already in progress", "job": existing.to_dict()})
+            return
+        if "content-length" not in headers:
+            await self._send_json(writer, 411, {"error": "Content-Length required"})
+            return
+        length = int(headers["content-length"])
+        if length > self.max_upload:
+            await self._send_json(writer, 413, {"error": f"upload exceeds {self.max_upload} bytes"})
+            return
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+
+        job = IngestJob(run_all.ScanJob(name))
+        self.jobs[name] = job
+        final_path = os.path.join(self.ctx.dirs["incoming"], name)
+        part_path = final_path + ".part"
+        parser = ply_stream.PlyStreamParser(self.max_vertices) if self.stream_parse else None
+        decoder = ply_stream.decompressor_for(name)
+        remaining = length
+        error = None
+        with open(part_path, "wb") as f:
+            while remaining > 0:
+                chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                # Disk writes and parsing run off the event loop so other requests keep flowing.
+                await asyncio.to_thread(f.write, chunk)
+                remaining -= len(chunk)
+                job.uploaded_bytes += len(chunk)
+                if parser is not None:
+                    try:
+                        await asyncio.to_thread(_feed, parser, decoder, chunk)
+                    except (ply_stream.PlyFormatError, OSError, EOFError, zlib.error) as e:
+                        error = f"rejected: {e}"
+                        break
+        if remaining and error is None:
+            error = "upload truncated"
+        if error:
+            os.remove(part_path)
+            job.state, job.error = "failed", error
+            await self._send_json(writer, 400, job.to_dict())
+            return
+        # Only complete uploads become visible to the sanitizer / run_all.
+        os.replace(part_path, final_path)
+        if parser is not None and parser.complete and not parser.has_faces:
+            points_path = os.path.join(self.ctx.dirs["processing"], ply_stream.scan_stem(name) + ".points.npy")
+            vertices = await asyncio.to_thread(parser.vertices)
+            await asyncio.to_thread(np.save, points_path, vertices)
+            job.scan.points_path = points_path
+            job.preparsed_vertices = len(vertices)
+        job.scan.submitted = time.perf_counter()
+        self._enqueue(job)
+        await self._send_json(writer, 202, job.to_dict())
+
+    async def _route(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        request_line = await reader.readline()
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            await self._send_json(writer, 400, {"error": "malformed request line"})
+            return
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        path = target.split("?", 1)[0].rstrip("/")
+        segments = [s for s in path.split("/") if s]
+        if segments == ["healthz"]:
+            await self._send_json(writer, 200, {"ok": True, "jobs": len(self.jobs)})
+        elif len(segments) == 2 and segments[0] == "scans":
+            if method in ("POST", "PUT"):
+                await self._receive_upload(reader, writer, segments[1], headers)
+            elif method in ("GET", "DELETE"):
+                job = self.jobs.get(segments[1])
+                if not job:
+                    await self._send_json(writer, 404, {"error": "unknown scan"})
+                    return
+                if method == "DELETE" and job.state not in ("done", "failed", "cancelled"):
+                    await asyncio.to_thread(job.scan.cancel)
+                await self._send_json(writer, 200, job.to_dict())
+            else:
+                await self._send_json(writer, 405, {"error": "method not allowed"})
+        elif len(segments) == 3 and segments[0] == "scans" and segments[2] in ("result", "preview") and method == "GET":
+            job = self.jobs.get(segments[1])
+            ready = job and (job.scan.preview_ready if segments[2] == "preview" else job.state == "done")
+            if not job:
+                await self._send_json(writer, 404, {"error": "unknown scan"})
+            elif not ready:
+                await self._send_json(writer, 409, {"error": f"{segments[2]} not ready", "job": job.to_dict()})
+            else:
+                name = job.scan.preview_glb_name if segments[2] == "preview" else job.scan.glb_name
+                await self._send_file(writer, os.path.join(self.ctx.dirs["outgoing"], name), "model/gltf-binary")
+        else:
+            await self._send_json(writer, 404, {"error": "not found"})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await self._route(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"[WARN] Request failed: {e}")
+            try:
+                await self._send_json(writer, 400, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+async def serve(ctx: run_all.RunContext, host: str, port: int) -> None:
+    server = IngestServer(ctx)
+    srv = await asyncio.start_server(server.handle, host, port)
+    addrs = ", ".join(str(s.getsockname()) for s in srv.sockets)
+    print(f"[OK] Ingest service listening on {addrs}")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rhinovate scan ingest service.")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--root", help="project root (default: this directory)")
+    parser.add_argument("--blender", help="override blender_path (a .py stand-in is run with this Python)")
+    args = parser.parse_args()
+
+    project_root = os.path.abspath(args.root or run_all.CODE_DIR)
+    config = run_all.load_config(project_root)
+    ingest_cfg = config.get("ingest", {})
+    ctx = run_all.make_context(project_root, config, args.blender)
+    if not ctx.blender_path or not os.path.isfile(ctx.blender_path):
+        print(f"[FAIL] Blender not found: {ctx.blender_path}")
+        sys.exit(1)
+
+    host = args.host or ingest_cfg.get("host", "127.0.0.1")
+    port = args.port or int(ingest_cfg.get("port", 8765))
+    try:
+        asyncio.run(serve(ctx, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ctx.ledger.close()
+        run_all.finish_trace(ctx)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Rhinovate job ledger: SQLite record of each scan's progress per stage.
+Tracks state (pending/running/done/failed), timings, input and config hashes and
+output paths so run_all can resume after a crash and skip work that is already
+done for the same input and settings. Query from the shell:
+    python job_ledger.py [--state failed] [--since-hours 24] [--stage morph]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+CONFIG_NAME = "config.json"
+DEFAULT_LEDGER = "pipeline_jobs.sqlite3"
+STATES = ("pending", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    scan        TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    state       TEXT NOT NULL CHECK (state IN ('pending', 'running', 'done', 'failed')),
+    input_hash  TEXT,
+    config_hash TEXT,
+    output_path TEXT,
+    error       TEXT,
+    queued_at   REAL,
+    started_at  REAL,
+    finished_at REAL,
+    duration    REAL,
+    PRIMARY KEY (scan, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state_finished ON jobs (state, finished_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_stage_state ON jobs (stage, state);
+"""
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_hash(config: dict, sections: tuple[str, ...]) -> str:
+    """Stable hash of the config a stage depends on: whole sections ("filtering")
+    or single keys ("pipeline.voxel_amount")."""
+    subset = {}
+    for name in sections:
+        section, _, key = name.partition(".")
+        subset[name] = (config.get(section) or {}).get(key) if key else config.get(section)
+    return hashlib.sha256(json.dumps(subset, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class JobLedger:
+    """Thread-safe wrapper around one SQLite connection (WAL mode)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def recover(self) -> int:
+        """Return stages left 'running' by a crashed run to 'pending'. Returns the count."""
+        with self._lock:
+            cur = self._conn.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running'")
+            return cur.rowcount
+
+    def get(self, scan: str, stage: str) -> dict | None:
+        rows = self._execute("SELECT * FROM jobs WHERE scan = ? AND stage = ?", (scan, stage))
+        return dict(rows[0]) if rows else None
+
+    def is_done(self, scan: str, stage: str, input_hash: str, cfg_hash: str) -> bool:
+        """True if the stage already finished for this exact input and config and its output exists."""
+        row = self.get(scan, stage)
+        return bool(
+            row
+            and row["state"] == "done"
+            and row["input_hash"] == input_hash
+            and row["config_hash"] == cfg_hash
+            and row["output_path"]
+            and os.path.exists(row["output_path"])
+        )
+
+    def enqueue(self, scan: str, stage: str) -> None:
+        """Record a stage as pending unless it is already tracked."""
+        self._execute(
+            "INSERT OR IGNORE INTO jobs (scan, stage, state, queued_at) VALUES (?, ?, 'pending', ?)",
+            (scan, stage, time.time()),
+        )
+
+    def start(self, scan: str, stage: str, input_hash: str, cfg_hash: str) -> None:
+        self._execute(
+            """
+            INSERT INTO jobs (scan, stage, state, input_hash, config_hash, queued_at, started_at)
+            VALUES (?, ?, 'running', ?, ?, ?, ?)
+            ON CONFLICT (scan, stage) DO UPDATE SET
+                state = 'running', input_hash = excluded.input_hash,
+                config_hash = excluded.config_hash, started_at = excluded.started_at,
+                finished_at = NULL, duration = NULL, error = NULL, output_path = NULL
+            """,
+            (scan, stage, input_hash, cfg_hash, time.time(), time.time()),
+        )
+
+    def finish(self, scan: str, stage: str, output_path: str) -> None:
+        now = time.time()
+        self._execute(
+            """
+            UPDATE jobs SET state = 'done', output_path = ?, finished_at = ?, duration = ? - started_at
+            WHERE scan = ? AND stage = ?
+            """,
+            (output_path, now, now, scan, stage),
+        )
+
+    def fail(self, scan: str, stage: str, error: str) -> None:
+        now = time.time()
+        self._execute(
+            """
+            UPDATE jobs SET state = 'failed', error = ?, finished_at = ?, duration = ? - started_at
+            WHERE scan = ? AND stage = ?
+            """,
+            (error, now, now, scan, stage),
+        )
+
+    def query(self, state: str | None = None, since: float | None = None, stage: str | None = None) -> list[dict]:
+        """Jobs filtered by state, stage and finished_at >= since (newest first)."""
+        clauses, params = [], []
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        if since is not None:
+            clauses.append("finished_at >= ?")
+            params.append(since)
+        if stage:
+            clauses.append("stage = ?")
+            params.append(stage)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._execute(f"SELECT * FROM jobs {where} ORDER BY finished_at DESC", tuple(params))
+        return [dict(r) for r in rows]
+
+
+def ledger_path(project_root: str, config: dict) -> str:
+    """orchestrator.ledger (relative to the project root), or the default.
+
+    With orchestrator.lease enabled the project folder is shared between nodes,
+    often over a network filesystem where SQLite's locking is unsafe, so the
+    default moves to a node-local file under ~/.rhinovate, one per project root.
+    """
+    orch = config.get("orchestrator", {})
+    if orch.get("ledger"):
+        return os.path.join(project_root, orch["ledger"])
+    if orch.get("lease", {}).get("enable", False):
+        digest = hashlib.sha256(os.path.abspath(project_root).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(os.path.expanduser("~"), ".rhinovate", f"pipeline_jobs-{digest}.sqlite3")
+    return os.path.join(project_root, DEFAULT_LEDGER)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the Rhinovate job ledger.")
+    parser.add_argument("--state", choices=STATES)
+    parser.add_argument("--stage")
+    parser.add_argument("--since-hours", type=float)
+    args = parser.parse_args()
+
+    root = os.environ.get("RHINOVATE_PROJECT_ROOT") or os.path.dirname(os.path.abspath(__file__))
+    config_file = os.path.join(root, CONFIG_NAME)
+    config = {}
+    if os.path.isfile(config_file):
+        with open(config_file, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    path = ledger_path(root, config)
+    if not os.path.isfile(path):
+        print(f"[WARN] No ledger at {path}")
+        sys.exit(1)
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours is not None else None
+    ledger = JobLedger(path)
+    for row in ledger.query(state=args.state, since=since, stage=args.stage):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["finished_at"])) if row["finished_at"] else "-"
+        took = f"{row['duration']:.1f}s" if row["duration"] is not None else "-"
+        line = f"{when}  {row['state']:<8} {row['stage']:<9} {took:>8}  {row['scan']}"
+        if row["error"]:
+            line += f"  ({row['error']})"
+        print(line)
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
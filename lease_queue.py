@@ -0,0 +1,260 @@
+"""
+Rhinovate lease queue: several run_all.py instances draining one incoming folder.
+Nodes share a lease directory (e.g. on the same network share as the project).
+A scan is claimed by creating <scan>.lease with O_CREAT | O_EXCL, so exactly one
+node wins. The owner touches its leases every heartbeat_s. A lease whose mtime has
+not changed for ttl_s, as observed on the claimant's own clock (so clock skew
+between machines does not matter), is abandoned. It is stolen by renaming it to a
+per-node name, which only one node can do, then claiming afresh. A finished scan
+gets a <scan>.done marker, written atomically, and is never claimed again. An
+owner whose heartbeat finds its lease gone or taken over stops work on that scan.
+Each claim carries a fresh token. Stage children run under a lease write their
+outputs under a temporary name tagged with it (staged_path); the orchestrator
+publishes them by rename only while the lease file still holds that token, so a
+node that lost its lease without noticing yet cannot overwrite the new owner's
+results.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+LEASE_SUFFIX = ".lease"
+DONE_SUFFIX = ".done"
+OUTPUT_TAG_ENV = "RHINOVATE_OUTPUT_TAG"  # set for stage children running under a lease
+
+
+class LeaseQueue:
+    def __init__(self, directory: str, ttl_s: float = 60.0, heartbeat_s: float = 10.0, on_lost=None):
+        self.directory = directory
+        self.ttl_s = float(ttl_s)
+        self.heartbeat_s = float(heartbeat_s)
+        self.node = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.on_lost = on_lost  # called with the scan name when a held lease is lost
+        self.held: set[str] = set()
+        self.lost: set[str] = set()
+        self._tokens: dict[str, str] = {}  # scan → token of our current claim
+        self.stolen = 0
+        self._seen: dict[str, tuple[float, float]] = {}  # scan → (lease mtime, local time first seen)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _lease(self, scan: str) -> str:
+        return os.path.join(self.directory, scan + LEASE_SUFFIX)
+
+    def _done(self, scan: str) -> str:
+        return os.path.join(self.directory, scan + DONE_SUFFIX)
+
+    def is_done(self, scan: str) -> bool:
+        return os.path.exists(self._done(scan))
+
+    def done_info(self, scan: str) -> dict:
+        try:
+            with open(self._done(scan), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _owner(self, path: str) -> str | None:
+        return self._read(path).get("node")
+
+    def _create(self, scan: str) -> bool:
+        try:
+            fd = os.open(self._lease(scan), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        token = uuid.uuid4().hex[:12]
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"node": self.node, "token": token, "claimed_at": time.time()}, f)
+        self._tokens[scan] = token
+        return True
+
+    def _expired(self, scan: str) -> bool:
+        """True once the lease's mtime has stayed the same for ttl_s of our own clock."""
+        try:
+            mtime = os.stat(self._lease(scan)).st_mtime
+        except FileNotFoundError:
+            return False
+        now = time.monotonic()
+        seen = self._seen.get(scan)
+        if seen is None or seen[0] != mtime:
+            self._seen[scan] = (mtime, now)
+            return False
+        return now - seen[1] >= self.ttl_s
+
+    def _steal(self, scan: str) -> bool:
+        """Take over an abandoned lease; only the node whose rename succeeds proceeds."""
+        lease = self._lease(scan)
+        mtime = self._seen[scan][0]
+        stale = f"{lease}.stale-{self.node}"
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return False  # another node got there first
+        try:
+            if os.stat(stale).st_mtime != mtime:
+                # The owner heartbeated between our check and the rename: hand it back.
+                try:
+                    os.link(stale, lease)
+                except OSError:
+                    pass  # someone re-claimed meanwhile; the owner sees that and stops
+                return False
+            return self._create(scan)
+        finally:
+            os.remove(stale)
+            self._seen.pop(scan, None)
+
+    def claim(self, scan: str) -> bool:
+        """Try to take the scan for this node. False if it is done or leased elsewhere."""
+        if scan in self.held or self.is_done(scan):
+            return False
+        got = self._create(scan)
+        if not got and self._expired(scan):
+            got = self._steal(scan)
+            if got:
+                self.stolen += 1
+        if got and self.is_done(scan):
+            # Finished elsewhere between our done check and the claim.
+            os.remove(self._lease(scan))
+            return False
+        if got:
+            with self._lock:
+                self.held.add(scan)
+        return got
+
+    def token(self, scan: str) -> str | None:
+        """Token of this node's claim on the scan, or None if it does not hold it."""
+        return self._tokens.get(scan) if scan in self.held else None
+
+    def holds(self, scan: str) -> bool:
+        """Check the lease file itself: still ours, under the same claim.
+
+        Unlike held, this does not wait for the next heartbeat to notice a takeover.
+        """
+        if scan not in self.held or scan in self.lost:
+            return False
+        return self._read(self._lease(scan)).get("token") == self._tokens.get(scan)
+
+    def complete(self, scan: str, status: str) -> bool:
+        """Write the done marker and drop the lease. False if the lease was lost (nothing written)."""
+        with self._lock:
+            if scan not in self.held or scan in self.lost:
+                self.held.discard(scan)
+                return False
+            self.held.discard(scan)
+        marker = self._done(scan)
+        tmp = f"{marker}.{self.node}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"node": self.node, "status": status, "finished_at": time.time()}, f)
+        os.replace(tmp, marker)
+        if self._owner(self._lease(scan)) == self.node:
+            os.remove(self._lease(scan))
+        return True
+
+    def release(self, scan: str) -> None:
+        """Give a lease back unfinished (e.g. on shutdown) so another node can take it at once."""
+        with self._lock:
+            self.held.discard(scan)
+        if self._owner(self._lease(scan)) == self.node:
+            os.remove(self._lease(scan))
+
+    def heartbeat(self) -> None:
+        """Refresh every held lease; report leases that are gone or owned by another node."""
+        with self._lock:
+            scans = [s for s in self.held if s not in self.lost]
+        for scan in scans:
+            lease = self._lease(scan)
+            if self._owner(lease) == self.node:
+                try:
+                    os.utime(lease)
+                    continue
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self.lost.add(scan)
+            if self.on_lost is not None:
+                self.on_lost(scan)
+
+    def start(self) -> None:
+        def beat() -> None:
+            while not self._stop.wait(self.heartbeat_s):
+                self.heartbeat()
+
+        self._thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for scan in list(self.held):
+            self.release(scan)
+
+
+def staged_path(path: str, tag: str | None = None) -> str:
+    """Where a stage child writes path: <stem>.~<tag><ext> under a lease (tag from
+    RHINOVATE_OUTPUT_TAG by default), path itself otherwise. The extension stays
+    last so exporters still pick the format from it."""
+    tag = tag or os.environ.get(OUTPUT_TAG_ENV)
+    if not tag:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.~{tag}{ext}"
+
+
+def _staged_files(directories, tag: str) -> list[tuple[str, str]]:
+    """(staged path, final path) for every file tagged with tag in directories."""
+    marker = f".~{tag}"
+    found = []
+    for directory in directories:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            if marker in name:
+                found.append((os.path.join(directory, name), os.path.join(directory, name.replace(marker, "", 1))))
+    return found
+
+
+def publish_staged(directories, tag: str) -> int:
+    """Rename a stage's staged outputs to their final names; returns how many."""
+    staged = _staged_files(directories, tag)
+    for path, final in staged:
+        os.replace(path, final)
+    return len(staged)
+
+
+def discard_staged(directories, tag: str) -> None:
+    """Remove a stage's staged outputs (failed stage or lost lease)."""
+    for path, _ in _staged_files(directories, tag):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def from_config(project_root: str, config: dict, on_lost=None) -> LeaseQueue | None:
+    """LeaseQueue for orchestrator.lease, or None when leasing is off."""
+    lease_cfg = config.get("orchestrator", {}).get("lease", {})
+    if not lease_cfg.get("enable", False):
+        return None
+    return LeaseQueue(
+        os.path.join(project_root, lease_cfg.get("dir", ".leases")),
+        ttl_s=float(lease_cfg.get("ttl_s", 60)),
+        heartbeat_s=float(lease_cfg.get("heartbeat_s", 10)),
+        on_lost=on_lost,
+    )
@@ -0,0 +1,117 @@
+"""
+Rhinovate mesh ordering: triangle and vertex order for GPU vertex-cache locality.
+Volume-to-mesh output comes in effectively arbitrary order, so consecutive triangles
+rarely share vertices and the post-transform cache misses on most of them. tipsify()
+reorders triangles with Sander et al.'s Tipsify (linear time, fan-walks a vertex's
+remaining triangles, then jumps to the best vertex still in the cache); the vertices
+are then renumbered by first use so vertex fetches walk memory forward.
+acmr() measures average cache misses per triangle on a FIFO cache (1.0 is about
+ideal for large regular meshes, 3.0 is no reuse). Plain numpy, so it also runs in
+Blender's Python.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+CACHE_SIZE = 16  # conservative post-transform cache size for mobile GPUs
+
+
+def acmr(faces: np.ndarray, cache_size: int = CACHE_SIZE) -> float:
+    """Average cache miss ratio (misses per triangle) of a FIFO vertex cache."""
+    faces = np.asarray(faces)
+    if len(faces) == 0:
+        return 0.0
+    # FIFO: a vertex is still cached iff fewer than cache_size misses happened since it was loaded.
+    loaded_at: dict[int, int] = {}
+    misses = 0
+    for v in faces.ravel().tolist():
+        t = loaded_at.get(v)
+        if t is None or misses - t >= cache_size:
+            loaded_at[v] = misses
+            misses += 1
+    return misses / len(faces)
+
+
+def _vertex_faces(faces: np.ndarray, n_vertices: int) -> tuple[list[int], list[int]]:
+    """CSR vertex → incident faces, as Python lists (faster to index in the walk)."""
+    flat = faces.ravel()
+    order = np.argsort(flat, kind="stable")
+    offsets = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=n_vertices), out=offsets[1:])
+    return offsets.tolist(), (order // 3).tolist()
+
+
+def tipsify(faces: np.ndarray, n_vertices: int, cache_size: int = CACHE_SIZE) -> np.ndarray:
+    """Triangle order (indices into faces) for vertex-cache locality."""
+    faces = np.asarray(faces, dtype=np.int64)
+    n_faces = len(faces)
+    if n_faces == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets, incident = _vertex_faces(faces, n_vertices)
+    tri = faces.tolist()
+    live = np.diff(offsets).tolist()  # triangles not yet emitted, per vertex
+    cache_time = [-(cache_size + 1)] * n_vertices
+    emitted = [False] * n_faces
+    order: list[int] = []
+    dead_end: list[int] = []
+    stamp = 0
+    cursor = 0
+    fan = int(faces[0, 0])
+    while fan >= 0:
+        candidates: list[int] = []
+        for t in incident[offsets[fan]:offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            order.append(t)
+            for v in tri[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if stamp - cache_time[v] > cache_size:
+                    cache_time[v] = stamp
+                    stamp += 1
+
+        # Next fan: a candidate whose remaining triangles still fit in the cache, oldest first.
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                age = stamp - cache_time[v]
+                priority = age if age + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    fan, best = v, priority
+        if fan < 0:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fan = v
+                    break
+        if fan < 0:
+            while cursor < n_vertices and live[cursor] == 0:
+                cursor += 1
+            fan = cursor if cursor < n_vertices else -1
+    return np.asarray(order, dtype=np.int64)
+
+
+def first_use_order(faces: np.ndarray, n_vertices: int) -> np.ndarray:
+    """Vertex order by first reference in faces; unreferenced vertices go last."""
+    flat = np.asarray(faces, dtype=np.int64).ravel()
+    first = np.full(n_vertices, len(flat), dtype=np.int64)
+    np.minimum.at(first, flat, np.arange(len(flat)))
+    return np.argsort(first, kind="stable")
+
+
+def optimize(vertices: np.ndarray, faces: np.ndarray, cache_size: int = CACHE_SIZE):
+    """Reorder triangles (Tipsify) then vertices (first use).
+
+    Returns (vertices, faces, face_order, vertex_order); the new faces reference the
+    new vertex numbering, and per-vertex data is reordered with vertices[vertex_order].
+    """
+    vertices = np.asarray(vertices)
+    faces = np.asarray(faces, dtype=np.int64)
+    face_order = tipsify(faces, len(vertices), cache_size)
+    faces = faces[face_order]
+    vertex_order = first_use_order(faces, len(vertices))
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[vertex_order] = np.arange(len(vertices))
+    return vertices[vertex_order], remap[faces], face_order, vertex_order
@@ -0,0 +1,48 @@
+"""
+Rhinovate normal estimation: per-point PCA normals for point clouds.
+Each point's k nearest neighbours (one cKDTree query per chunk) give a 3×3
+covariance; a batched numpy.linalg.eigh over all of them yields the smallest
+eigenvector as the normal. Normals are then flipped to face the sensor or away
+from the cloud's centroid, so the surface side is consistent.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+CHUNK = 200_000  # points per k-NN / eigh batch (bounds the (m, k, 3) neighbour array)
+
+
+def estimate_normals(points: np.ndarray, k: int = 16, chunk: int = CHUNK) -> np.ndarray:
+    """Unit PCA normals (N, 3), unoriented. Fewer than 3 points give zero normals."""
+    from scipy.spatial import cKDTree
+
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    normals = np.zeros((n, 3), dtype=np.float64)
+    if n < 3:
+        return normals
+    k = min(k, n)
+    tree = cKDTree(points)
+    for start in range(0, n, chunk):
+        block = points[start:start + chunk]
+        _, idx = tree.query(block, k=k, workers=-1)
+        nb = points[idx]
+        nb -= nb.mean(axis=1, keepdims=True)
+        cov = np.matmul(nb.transpose(0, 2, 1), nb)  # batched 3×k @ k×3
+        _, vecs = np.linalg.eigh(cov)  # ascending eigenvalues
+        normals[start:start + len(block)] = vecs[:, :, 0]
+    return normals
+
+
+def orient_normals(points: np.ndarray, normals: np.ndarray, mode: str = "centroid", sensor=None) -> np.ndarray:
+    """Flip normals in place: "sensor" → toward the sensor position, "centroid" → away from the centroid."""
+    if mode == "sensor":
+        ref = np.asarray(sensor if sensor is not None else (0.0, 0.0, 0.0), dtype=np.float64) - points
+    elif mode == "centroid":
+        ref = points - points.mean(axis=0)
+    else:
+        raise ValueError(f"unknown normal orientation {mode!r} (use 'sensor' or 'centroid')")
+    flip = np.einsum("ij,ij->i", normals, ref) < 0
+    normals[flip] *= -1.0
+    return normals
+
@@ -2,17 +2,38 @@
 Rhinovate Blender morph engine: OBJ → morphed GLB.
 Loads sanitized OBJ from 2_Processing, optionally voxelizes (Points→Volume→Mesh),
 applies lattice-based nose morph, exports to 3_Outgoing. Uses config.json via
-RHINOVATE_PROJECT_ROOT. Run via: blender --background --python pipeline_hd.py
+RHINOVATE_PROJECT_ROOT. Run via: blender --background --python pipeline_hd.py [-- scan.obj]
+Without a scan argument the newest OBJ in 2_Processing is used. Voxelized meshes are
+cached (voxel_cache.py), so reruns that only change lattice settings skip meshing.
+With pipeline.sweep set, the loaded mesh is also exported once per lattice variant.
+With pipeline.smooth_iterations > 0, Blender-voxelized meshes get Taubin smoothing
+(smoothing.py) to remove stair-stepping. With pipeline.optimize_order, they are
+reordered for the GPU vertex cache (mesh_order.py) before export.
+With --preview (after the scan name), the *_preview.obj is meshed at preview.voxel_amount
+and exported as *_preview.glb, without cache or sweep.
 """
 from __future__ import annotations
 
+import glob
+import itertools
 import json
 import os
+import re
 import sys
-import glob
+import time
 
 import bpy
 import mathutils
+import numpy as np
+
+# Blender does not put the script's directory on sys.path.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hole_fill  # noqa: E402
+import lease_queue  # noqa: E402
+import mesh_order  # noqa: E402
+import smoothing  # noqa: E402
+import tracing  # noqa: E402
+import voxel_cache  # noqa: E402
 
 CONFIG_NAME = "config.json"
 
@@ -69,6 +90,129 @@ def _voxelize(obj: bpy.types.Object, cfg: dict) -> None:
     bpy.ops.object.modifier_apply(modifier="Mesher")
 
 
+def _import_obj(path: str) -> bpy.types.Object:
+    """Import an OBJ and return its first mesh object."""
+    try:
+        bpy.ops.wm.obj_import(filepath=path)
+    except Exception:
+        try:
+            bpy.ops.import_scene.obj(filepath=path)
+        except Exception as e:
+            _fail(f"[FAIL] Import failed: {e}")
+
+    objs_sel = [o for o in bpy.context.selected_objects if o.type == "MESH"]
+    if not objs_sel:
+        _fail("[FAIL] No mesh imported.")
+    return objs_sel[0]
+
+
+def _export_obj(obj: bpy.types.Object, path: str) -> None:
+    """Export one object as OBJ (geometry only)."""
+    bpy.ops.object.select_all(action="DESELECT")
+    obj.select_set(True)
+    try:
+        bpy.ops.wm.obj_export(filepath=path, export_selected_objects=True, export_materials=False)
+    except AttributeError:
+        bpy.ops.export_scene.obj(filepath=path, use_selection=True, use_materials=False)
+
+
+def _voxelize_cached(obj: bpy.types.Object, input_path: str, cfg: dict, cache) -> bpy.types.Object:
+    """_voxelize through the voxel cache. Returns the (possibly replaced) scan object."""
+    if cache is None:
+        _voxelize(obj, cfg)
+        return obj
+
+    key = voxel_cache.cache_key(input_path, cfg)
+    cached = cache.lookup(key)
+    if cached:
+        print(f"   Voxel cache hit ({key[:12]}), skipping meshing")
+        bpy.data.objects.remove(obj, do_unlink=True)
+        obj = _import_obj(cached)
+        obj.name = "Patient_Scan"
+        return obj
+
+    _voxelize(obj, cfg)
+    try:
+        _export_obj(obj, cache.staging_path(key))
+        cache.commit(key)
+        print(f"   Voxel cache stored ({key[:12]})")
+    except Exception as e:
+        print(f"   [WARN] Voxel cache write failed: {e}")
+    return obj
+
+
+def _optimize_order(obj: bpy.types.Object, cfg: dict) -> None:
+    """Reorder the mesh's faces (Tipsify over its loop triangles) and vertices (first use)
+    for GPU vertex-cache locality; the glTF exporter keeps the face order."""
+    import bmesh
+
+    me = obj.data
+    me.calc_loop_triangles()
+    n_tris = len(me.loop_triangles)
+    if n_tris == 0:
+        return
+    t0 = time.perf_counter()
+    tris = np.empty(n_tris * 3, dtype=np.int64)
+    me.loop_triangles.foreach_get("vertices", tris)
+    tris = tris.reshape(-1, 3)
+    tri_poly = np.empty(n_tris, dtype=np.int64)
+    me.loop_triangles.foreach_get("polygon_index", tri_poly)
+    cache_size = int(cfg.get("order_cache_size", mesh_order.CACHE_SIZE))
+    before = mesh_order.acmr(tris, cache_size)
+
+    tri_order = mesh_order.tipsify(tris, len(me.vertices), cache_size)
+    # A polygon takes the position of its first triangle; then vertices by first use.
+    first = np.full(len(me.polygons), n_tris, dtype=np.int64)
+    np.minimum.at(first, tri_poly[tri_order], np.arange(n_tris))
+    face_rank = np.empty(len(me.polygons), dtype=np.int64)
+    face_rank[np.argsort(first, kind="stable")] = np.arange(len(me.polygons))
+    vertex_rank = np.empty(len(me.vertices), dtype=np.int64)
+    vertex_rank[mesh_order.first_use_order(tris[tri_order], len(me.vertices))] = np.arange(len(me.vertices))
+
+    bm = bmesh.new()
+    bm.from_mesh(me)
+    for face, rank in zip(bm.faces, face_rank.tolist()):
+        face.index = rank
+    bm.faces.sort()
+    for vert, rank in zip(bm.verts, vertex_rank.tolist()):
+        vert.index = rank
+    bm.verts.sort()
+    bm.to_mesh(me)
+    bm.free()
+    me.update()
+
+    me.calc_loop_triangles()
+    tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int64)
+    me.loop_triangles.foreach_get("vertices", tris)
+    after = mesh_order.acmr(tris.reshape(-1, 3), cache_size)
+    print(f"   Vertex cache: ACMR {before:.2f} → {after:.2f} (cache {cache_size}, {time.perf_counter() - t0:.2f}s)")
+
+
+def _smooth(obj: bpy.types.Object, cfg: dict) -> None:
+    """Taubin smoothing of the voxelized mesh (smoothing.py), in place."""
+    iterations = int(cfg.get("smooth_iterations", 0))
+    me = obj.data
+    me.calc_loop_triangles()
+    if iterations <= 0 or len(me.loop_triangles) == 0:
+        return
+    t0 = time.perf_counter()
+    co = np.empty(len(me.vertices) * 3, dtype=np.float64)
+    me.vertices.foreach_get("co", co)
+    tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int64)
+    me.loop_triangles.foreach_get("vertices", tris)
+    co = smoothing.taubin_smooth(
+        co.reshape(-1, 3),
+        tris.reshape(-1, 3),
+        iterations=iterations,
+        lam=float(cfg.get("smooth_lambda", 0.5)),
+        mu=float(cfg.get("smooth_mu", -0.53)),
+        weights=cfg.get("smooth_weights", "uniform"),
+    )
+    me.vertices.foreach_set("co", co.ravel())
+    me.update()
+    print(f"   Smoothed: {iterations} Taubin iterations ({time.perf_counter() - t0:.2f}s)")
+
+
 def _ensure_visible(obj: bpy.types.Object) -> None:
     """Ensure mesh is centered at origin and has valid geometry."""
     # Update mesh data
@@ -96,12 +240,10 @@ def _ensure_visible(obj: bpy.types.Object) -> None:
     # bpy.ops.view3d.view_all()
 
 
-def _lattice_morph(obj: bpy.types.Object, cfg: dict) -> None:
-    """9×9×9 lattice around bbox center, resize middle U-columns on X."""
+def _build_cage(obj: bpy.types.Object, cfg: dict) -> bpy.types.Object:
+    """lattice_points³ lattice around bbox center, bound to obj via a Lattice modifier."""
     lp = int(cfg.get("lattice_points", 9))
     pad = float(cfg.get("lattice_padding", 1.1))
-    resize_x = float(cfg.get("lattice_resize_x", 0.8))
-    brush = float(cfg.get("lattice_brush_factor", 0.25))
 
     local_center = 0.125 * sum((mathutils.Vector(b) for b in obj.bound_box), mathutils.Vector())
     global_center = obj.matrix_world @ local_center
@@ -117,9 +259,19 @@ def _lattice_morph(obj: bpy.types.Object, cfg: dict) -> None:
 
     mod = obj.modifiers.new(name="Lattice_Deform", type="LATTICE")
     mod.object = lat_obj
+    return lat_obj
+
+
+def _apply_brush(lat_obj: bpy.types.Object, cfg: dict, width: float) -> None:
+    """Reset the cage, then resize the middle U-columns on X with a smooth falloff."""
+    lat_data = lat_obj.data
+    lp = lat_data.points_u
+    resize_x = float(cfg.get("lattice_resize_x", 0.8))
+    brush = float(cfg.get("lattice_brush_factor", 0.25))
 
     mid = lp // 2
     for i, pt in enumerate(lat_data.points):
+        pt.co_deform = pt.co
         if (i % lp) in (mid - 1, mid, mid + 1):
             pt.select = True
         else:
@@ -127,7 +279,7 @@ def _lattice_morph(obj: bpy.types.Object, cfg: dict) -> None:
 
     bpy.context.view_layer.objects.active = lat_obj
     bpy.ops.object.mode_set(mode="EDIT")
-    brush_size = dims.x * brush
+    brush_size = width * brush
     bpy.ops.transform.resize(
         value=(resize_x, 1.0, 1.0),
         use_proportional_edit=True,
@@ -137,7 +289,101 @@ def _lattice_morph(obj: bpy.types.Object, cfg: dict) -> None:
     bpy.ops.object.mode_set(mode="OBJECT")
 
 
-def run_pipeline() -> None:
+def _lattice_morph(obj: bpy.types.Object, cfg: dict) -> bpy.types.Object:
+    """9×9×9 lattice around bbox center, resize middle U-columns on X. Returns the cage."""
+    width = obj.dimensions.x
+    lat_obj = _build_cage(obj, cfg)
+    _apply_brush(lat_obj, cfg, width)
+    return lat_obj
+
+
+CAGE_KEYS = ("lattice_points", "lattice_padding")
+BRUSH_KEYS = ("lattice_resize_x", "lattice_brush_factor")
+
+
+def _sweep_variants(cfg: dict) -> list[tuple[str, dict]]:
+    """(tag, overrides) per variant from pipeline.sweep.
+
+    A list gives one variant per entry ({"name": ..., "lattice_resize_x": ...});
+    a dict of lists is expanded as a grid over all combinations.
+    """
+    sweep = cfg.get("sweep") or []
+    if isinstance(sweep, dict):
+        keys = list(sweep)
+        combos = itertools.product(*(v if isinstance(v, list) else [v] for v in sweep.values()))
+        sweep = [dict(zip(keys, combo)) for combo in combos]
+    variants = []
+    for i, entry in enumerate(sweep, 1):
+        overrides = {k: v for k, v in entry.items() if k != "name"}
+        unknown = set(overrides) - set(CAGE_KEYS + BRUSH_KEYS)
+        if unknown:
+            print(f"   [WARN] Sweep variant {i}: ignoring non-lattice keys {sorted(unknown)}")
+            overrides = {k: v for k, v in overrides.items() if k not in unknown}
+        tag = re.sub(r"[^A-Za-z0-9.-]+", "-", str(entry.get("name") or f"v{i:02d}"))
+        variants.append((tag, overrides))
+    return variants
+
+
+def _export_glb(obj: bpy.types.Object, out_path: str) -> None:
+    """Export obj with modifiers applied (the base mesh in the scene is left as is).
+    Under a lease the file goes to its staged name; the orchestrator publishes it."""
+    if len(obj.data.vertices) == 0:
+        _fail("[FAIL] Mesh has no vertices - cannot export!")
+
+    bpy.ops.object.select_all(action="DESELECT")
+    obj.select_set(True)
+    bpy.ops.export_scene.gltf(
+        filepath=lease_queue.staged_path(out_path),
+        use_selection=True,
+        export_apply=True,
+        export_format="GLB",
+    )
+
+
+def _run_sweep(obj: bpy.types.Object, lat_obj: bpy.types.Object, pl: dict, width: float, stem: str, output_dir: str) -> None:
+    """Export one GLB per sweep variant, re-using the loaded mesh and, where possible, the cage.
+
+    Writes <stem>_sweep.json listing each variant's parameters, output and marginal time.
+    """
+    variants = _sweep_variants(pl)
+    print(f"Sweeping {len(variants)} morph variant(s)...")
+    cage_params = {k: pl.get(k) for k in CAGE_KEYS}
+    manifest = []
+    for tag, overrides in variants:
+        t0 = time.perf_counter()
+        cfg = {**pl, **overrides}
+        out_name = f"{stem}_healed_{tag}.glb"
+        with tracing.span("sweep variant", variant=tag, **overrides):
+            params = {k: cfg.get(k) for k in CAGE_KEYS}
+            if params != cage_params:
+                # Different lattice resolution or padding: the cage has to be rebuilt.
+                obj.modifiers.remove(obj.modifiers["Lattice_Deform"])
+                bpy.data.objects.remove(lat_obj, do_unlink=True)
+                lat_obj = _build_cage(obj, cfg)
+                cage_params = params
+            _apply_brush(lat_obj, cfg, width)
+            _export_glb(obj, os.path.join(output_dir, out_name))
+        elapsed = time.perf_counter() - t0
+        manifest.append({
+            "variant": tag,
+            "params": {k: cfg.get(k) for k in CAGE_KEYS + BRUSH_KEYS},
+            "output": out_name,
+            "seconds": round(elapsed, 3),
+        })
+        print(f"   [OK] {out_name} ({elapsed:.2f}s)")
+
+    manifest_name = f"{stem}_sweep.json"
+    with open(lease_queue.staged_path(os.path.join(output_dir, manifest_name)), "w", encoding="utf-8") as f:
+        json.dump({"scan": stem, "variants": manifest}, f, indent=2)
+    print(f"[OK] Sweep finished: {len(manifest)} variant(s), manifest {manifest_name}")
+
+
+def _script_args() -> list[str]:
+    """Arguments after Blender's "--" separator."""
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+
+def run_pipeline(input_name: str | None = None, preview: bool = False) -> None:
     config = _load_config()
     folders = config.get("folders", {})
     proc = folders.get("processing", "2_Processing")
@@ -148,67 +394,79 @@ def run_pipeline() -> None:
     output_dir = os.path.join(root, out)
     os.makedirs(output_dir, exist_ok=True)
 
-    obj_files = glob.glob(os.path.join(input_dir, "*.obj"))
-    if not obj_files:
-        _fail("[FAIL] No .obj files in '2_Processing'. Run sanitizer first.")
-
-    latest = max(obj_files, key=os.path.getctime)
-    filename = os.path.basename(latest)
+    if input_name:
+        input_path = os.path.join(input_dir, input_name)
+        if not os.path.isfile(input_path):
+            _fail(f"[FAIL] Input not found: {input_path}")
+    else:
+        obj_files = glob.glob(os.path.join(input_dir, "*.obj"))
+        if not obj_files:
+            _fail("[FAIL] No .obj files in '2_Processing'. Run sanitizer first.")
+        input_path = max(obj_files, key=os.path.getctime)
+    filename = os.path.basename(input_path)
     print(f"Loading: {filename}")
+    t_start = time.perf_counter()
+    tracing.process_name("blender" + (" preview" if preview else ""))
 
     bpy.ops.object.select_all(action="SELECT")
     bpy.ops.object.delete()
 
-    try:
-        bpy.ops.wm.obj_import(filepath=latest)
-    except Exception:
-        try:
-            bpy.ops.import_scene.obj(filepath=latest)
-        except Exception as e:
-            _fail(f"[FAIL] Import failed: {e}")
-
-    objs_sel = [o for o in bpy.context.selected_objects if o.type == "MESH"]
-    if not objs_sel:
-        _fail("[FAIL] No mesh imported.")
-    obj = objs_sel[0]
+    with tracing.span("import", file=filename):
+        obj = _import_obj(input_path)
     obj.name = "Patient_Scan"
-    bpy.ops.object.shade_smooth()
     
     print(f"   Initial vertices: {len(obj.data.vertices)}")
 
     pl = config.get("pipeline", {})
-    if pl.get("use_voxelization"):
+    cache = voxel_cache.from_config(root, config)
+    if preview:
+        # Coarse and throwaway: low resolution, no smoothing or sweep, keep it out of the cache.
+        pl = {
+            **pl,
+            "voxel_amount": int(config.get("preview", {}).get("voxel_amount", 48)),
+            "smooth_iterations": 0,
+            "sweep": [],
+        }
+        cache = None
+    if pl.get("use_voxelization") and hole_fill.read_report(input_path).get("skip_voxelize"):
+        print("[SKIP] Voxelization: input mesh is watertight (sanitizer hole filling)")
+    elif pl.get("use_voxelization") and pl.get("voxel_backend", "blender") != "python":
         print("Voxelizing...")
-        _voxelize(obj, pl)
-        _ensure_visible(obj)
+        with tracing.span("voxelize", voxel_amount=pl.get("voxel_amount")):
+            obj = _voxelize_cached(obj, input_path, pl, cache)
+            _ensure_visible(obj)
+        if pl.get("smooth_iterations", 0):
+            with tracing.span("smooth"):
+                _smooth(obj, pl)
+        if pl.get("optimize_order", False):
+            with tracing.span("optimize order"):
+                _optimize_order(obj, pl)
+
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+    bpy.ops.object.shade_smooth()
 
     print("Applying lattice morph...")
-    _lattice_morph(obj, pl)
-    _ensure_visible(obj)
+    width = obj.dimensions.x
+    with tracing.span("lattice"):
+        lat_obj = _lattice_morph(obj, pl)
+        _ensure_visible(obj)
 
-    out_name = filename.replace(".obj", "_healed.glb")
-    out_path = os.path.join(output_dir, out_name)
-    
-    # Final validation
-    if len(obj.data.vertices) == 0:
-        _fail("[FAIL] Mesh has no vertices - cannot export!")
-    
-    bpy.ops.object.select_all(action="DESELECT")
-    obj.select_set(True)
-    
-    # Export with proper settings
-    bpy.ops.export_scene.gltf(
-        filepath=out_path,
-        use_selection=True,
-        export_apply=True,
-        export_format="GLB",
-    )
+    out_name = filename.replace(".obj", ".glb" if preview else "_healed.glb")
+    with tracing.span("export", file=out_name):
+        _export_glb(obj, os.path.join(output_dir, out_name))
     print(f"[OK] Exported: {out_name} ({len(obj.data.vertices)} vertices, dims: {obj.dimensions})")
+    print(f"   Load + voxelize + morph + export: {time.perf_counter() - t_start:.2f}s")
+
+    if pl.get("sweep"):
+        _run_sweep(obj, lat_obj, pl, width, os.path.splitext(filename)[0], output_dir)
 
 
 if __name__ == "__main__":
     try:
-        run_pipeline()
+        args = _script_args()
+        names = [a for a in args if not a.startswith("--")]
+        run_pipeline(names[0] if names else None, preview="--preview" in args)
     except Exception as e:
         print(f"[FAIL] Pipeline error: {e}")
         sys.exit(1)
@@ -0,0 +1,320 @@
+"""
+Rhinovate incremental PLY parser.
+Accepts the file as a sequence of byte chunks (e.g. straight off an upload socket
+or a decompressor): the header is validated as soon as it is complete, then the
+vertex block is decoded row by row as bytes arrive. Non-finite points are dropped
+on the fly and running bounds are kept, so early rejection and the first cleanup
+steps overlap with the transfer instead of waiting for the whole file.
+Compressed scans (.ply.gz / .ply.bz2 / .ply.xz) are decompressed chunk by chunk
+into the parser, without an uncompressed temporary file.
+"""
+from __future__ import annotations
+
+import bz2
+import gzip
+import lzma
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+_FORMATS = {"ascii": None, "binary_little_endian": "<", "binary_big_endian": ">"}
+MAX_HEADER_BYTES = 64 * 1024
+READ_CHUNK = 1 << 20
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz")
+SCAN_SUFFIXES = (".ply",) + tuple(".ply" + s for s in COMPRESSED_SUFFIXES)
+
+
+class PlyFormatError(ValueError):
+    """The stream is not a PLY this parser can handle."""
+
+
+def is_scan_file(name: str) -> bool:
+    """True for .ply and compressed .ply.gz / .ply.bz2 / .ply.xz names."""
+    return name.lower().endswith(SCAN_SUFFIXES)
+
+
+def compression_of(name: str) -> str | None:
+    """Compression suffix of a scan name ('.gz', '.bz2', '.xz') or None."""
+    lower = name.lower()
+    return next((s for s in COMPRESSED_SUFFIXES if lower.endswith(s)), None)
+
+
+def scan_stem(name: str) -> str:
+    """Scan name without compression and .ply suffix: 'a.ply.gz' → 'a'."""
+    suffix = compression_of(name)
+    if suffix:
+        name = name[: -len(suffix)]
+    return name[:-4] if name.lower().endswith(".ply") else name
+
+
+class _GzipStream:
+    """Incremental gzip decoder that also handles concatenated members."""
+
+    def __init__(self):
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            out.append(self._d.decompress(data))
+            data = self._d.unused_data
+            if data:
+                self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(out)
+
+
+def decompressor_for(name: str):
+    """Incremental decompressor for a scan name (object with .decompress), or None."""
+    suffix = compression_of(name)
+    if suffix == ".gz":
+        return _GzipStream()
+    if suffix == ".bz2":
+        return bz2.BZ2Decompressor()
+    if suffix == ".xz":
+        return lzma.LZMADecompressor()
+    return None
+
+
+def open_scan(path: str):
+    """Binary file object for a scan, transparently decompressing."""
+    opener = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}.get(compression_of(path), open)
+    return opener(path, "rb")
+
+
+@dataclass
+class PlyElement:
+    name: str
+    count: int
+    properties: list[tuple[str, str]] = field(default_factory=list)  # (name, numpy type)
+    has_list: bool = False
+
+
+@dataclass
+class PlyHeader:
+    format: str
+    elements: list[PlyElement]
+    size: int  # bytes up to and including the end_header line
+
+    def element(self, name: str) -> PlyElement | None:
+        return next((e for e in self.elements if e.name == name), None)
+
+    @property
+    def vertex_count(self) -> int:
+        vertex = self.element("vertex")
+        return vertex.count if vertex else 0
+
+    @property
+    def face_count(self) -> int:
+        face = self.element("face")
+        return face.count if face else 0
+
+    def vertex_dtype(self) -> np.dtype:
+        """Structured dtype of one binary vertex row."""
+        order = _FORMATS[self.format] or "<"
+        return np.dtype([(name, order + t) for name, t in self.element("vertex").properties])
+
+
+def parse_header(data: bytes) -> PlyHeader | None:
+    """Parse a header from the start of data; None if end_header has not arrived yet."""
+    if not data.startswith(b"ply"):
+        if len(data) >= 3:
+            raise PlyFormatError("missing 'ply' magic")
+        return None
+    end = data.find(b"end_header")
+    if end < 0:
+        if len(data) > MAX_HEADER_BYTES:
+            raise PlyFormatError("header too large")
+        return None
+    newline = data.find(b"\n", end)
+    if newline < 0:
+        return None
+
+    fmt = None
+    elements: list[PlyElement] = []
+    for raw in data[:end].decode("ascii", errors="replace").splitlines()[1:]:
+        tokens = raw.split()
+        if not tokens or tokens[0] in ("comment", "obj_info"):
+            continue
+        if tokens[0] == "format":
+            if len(tokens) < 2 or tokens[1] not in _FORMATS:
+                raise PlyFormatError(f"unsupported format line: {raw.strip()}")
+            fmt = tokens[1]
+        elif tokens[0] == "element":
+            if len(tokens) != 3 or not tokens[2].isdigit():
+                raise PlyFormatError(f"bad element line: {raw.strip()}")
+            elements.append(PlyElement(tokens[1], int(tokens[2])))
+        elif tokens[0] == "property":
+            if not elements:
+                raise PlyFormatError("property before any element")
+            if len(tokens) >= 5 and tokens[1] == "list":
+                elements[-1].has_list = True
+                elements[-1].properties.append((tokens[4], "list"))
+            elif len(tokens) == 3 and tokens[1] in _TYPES:
+                elements[-1].properties.append((tokens[2], _TYPES[tokens[1]]))
+            else:
+                raise PlyFormatError(f"bad property line: {raw.strip()}")
+    if fmt is None:
+        raise PlyFormatError("missing format line")
+    return PlyHeader(fmt, elements, newline + 1)
+
+
+def read_header(path: str) -> PlyHeader:
+    """Read only the header of a (possibly compressed) PLY file on disk."""
+    with open_scan(path) as f:
+        header = parse_header(f.read(MAX_HEADER_BYTES))
+    if header is None:
+        raise PlyFormatError("incomplete header")
+    return header
+
+
+class PlyStreamParser:
+    """Feed PLY bytes in arbitrary chunks; vertex positions are decoded as they arrive.
+
+    Only the vertex element is decoded (x, y, z); later elements are counted and
+    skipped, with has_faces telling the caller a full mesh load is still needed.
+    """
+
+    def __init__(self, max_vertices: int | None = None):
+        self.max_vertices = max_vertices
+        self.header: PlyHeader | None = None
+        self.dropped_nonfinite = 0
+        self.bounds_min = np.full(3, np.inf)
+        self.bounds_max = np.full(3, -np.inf)
+        self._buf = bytearray()
+        self._chunks: list[np.ndarray] = []
+        self._rows_seen = 0
+        self._trailing = 0
+        self._row_dtype: np.dtype | None = None
+        self._xyz_cols: list[int] = []
+
+    @property
+    def vertices_seen(self) -> int:
+        return self._rows_seen
+
+    @property
+    def complete(self) -> bool:
+        """True once the whole vertex block has been decoded."""
+        return self.header is not None and self._rows_seen >= self.header.vertex_count
+
+    @property
+    def has_faces(self) -> bool:
+        return self.header is not None and self.header.face_count > 0
+
+    def _validate(self, header: PlyHeader) -> None:
+        if not header.elements or header.elements[0].name != "vertex":
+            raise PlyFormatError("vertex element must come first")
+        vertex = header.elements[0]
+        names = [n for n, _ in vertex.properties]
+        if vertex.has_list:
+            raise PlyFormatError("list properties in vertex element are not supported")
+        if not all(axis in names for axis in ("x", "y", "z")):
+            raise PlyFormatError("vertex element lacks x/y/z")
+        if vertex.count == 0:
+            raise PlyFormatError("no vertices")
+        if self.max_vertices is not None and vertex.count > self.max_vertices:
+            raise PlyFormatError(f"{vertex.count} vertices exceeds limit of {self.max_vertices}")
+        self._xyz_cols = [names.index(axis) for axis in ("x", "y", "z")]
+        if header.format != "ascii":
+            self._row_dtype = header.vertex_dtype()
+
+    def feed(self, data: bytes) -> None:
+        """Consume the next chunk. Raises PlyFormatError as soon as the input is unusable."""
+        if self.complete:
+            self._trailing += len(data)
+            return
+        self._buf += data
+        if self.header is None:
+            header = parse_header(bytes(self._buf[:MAX_HEADER_BYTES + 1]))
+            if header is None:
+                return
+            self._validate(header)
+            self.header = header
+            del self._buf[:header.size]
+        self._decode()
+
+    def _decode(self) -> None:
+        remaining = self.header.vertex_count - self._rows_seen
+        if self._row_dtype is not None:
+            row = self._row_dtype.itemsize
+            n = min(len(self._buf) // row, remaining)
+            if n == 0:
+                return
+            rows = np.frombuffer(bytes(self._buf[:n * row]), dtype=self._row_dtype)
+            del self._buf[:n * row]
+            names = self._row_dtype.names
+            xyz = np.stack([rows[names[c]] for c in self._xyz_cols], axis=1).astype(np.float64)
+        else:
+            cut = self._buf.rfind(b"\n")
+            if cut < 0:
+                return
+            # Consume up to the newline ending the last row we need; counting from line
+            # lengths would be off by one per row for CRLF input.
+            ends = np.flatnonzero(np.frombuffer(bytes(self._buf[:cut + 1]), dtype=np.uint8) == ord("\n"))
+            consumed = int(ends[remaining - 1]) + 1 if len(ends) > remaining else cut + 1
+            lines = bytes(self._buf[:consumed]).split(b"\n")[:-1]
+            del self._buf[:consumed]
+            lines = [line for line in lines if line.strip()]
+            n = len(lines)
+            if n == 0:
+                return
+            ncols = len(self.header.elements[0].properties)
+            try:
+                table = np.array(b" ".join(lines).split(), dtype=np.float64).reshape(n, ncols)
+            except ValueError as e:
+                raise PlyFormatError(f"bad ascii vertex row: {e}") from e
+            xyz = table[:, self._xyz_cols]
+        self._rows_seen += n
+        finite = np.isfinite(xyz).all(axis=1)
+        if not finite.all():
+            self.dropped_nonfinite += int((~finite).sum())
+            xyz = xyz[finite]
+        if len(xyz):
+            self.bounds_min = np.minimum(self.bounds_min, xyz.min(axis=0))
+            self.bounds_max = np.maximum(self.bounds_max, xyz.max(axis=0))
+            self._chunks.append(xyz)
+        if self.complete:
+            self._trailing += len(self._buf)
+            self._buf = bytearray()
+
+    def vertices(self) -> np.ndarray:
+        """All finite vertex positions decoded so far, (N, 3) float64."""
+        if not self._chunks:
+            return np.zeros((0, 3), dtype=np.float64)
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0]
+
+    def finish(self) -> np.ndarray:
+        """Check the vertex block is complete and return the vertices."""
+        if self.header is None:
+            raise PlyFormatError("stream ended before end_header")
+        if not self.complete:
+            raise PlyFormatError(
+                f"stream ended after {self._rows_seen} of {self.header.vertex_count} vertices"
+            )
+        return self.vertices()
+
+
+def parse_file(path: str, max_vertices: int | None = None) -> PlyStreamParser:
+    """Stream a (possibly compressed) PLY from disk through the parser in fixed-size chunks.
+
+    A mesh (has_faces) stops after its header: the caller needs a full mesh load
+    anyway, so its vertex block is neither decompressed nor decoded here.
+    """
+    parser = PlyStreamParser(max_vertices)
+    header = read_header(path)
+    if header.face_count > 0:
+        parser.header = header
+        return parser
+    decoder = decompressor_for(path)
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            parser.feed(decoder.decompress(chunk) if decoder else chunk)
+    return parser
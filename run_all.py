@@ -1,15 +1,106 @@
 """
 Rhinovate pipeline orchestrator.
-Runs sanitizer then Blender morph engine. Uses config.json for paths and params.
+Runs sanitizer then Blender morph engine per scan. Uses config.json for paths and params.
+Each scan is its own job through both stages, so Blender work on one scan overlaps
+sanitization of the next; concurrency per stage is set in the "orchestrator" section.
+Stage state is recorded in the job ledger, so a rerun only dispatches unfinished work.
+Each stage child runs in its own process group with an optional wall-clock timeout and
+memory/CPU rlimits; on expiry or cancellation the whole group is terminated.
+With "preview" enabled, each scan first gets a coarse *_preview.glb within a time budget.
+With orchestrator.memory_budget_mb set, stages are admitted only while their estimated
+peak memory fits the budget (admission.py), smallest scans first.
+With orchestrator.lease enabled, several instances (on one machine or sharing a network
+folder) claim disjoint scans through file leases (lease_queue.py) and drain the folder together.
 """
+from __future__ import annotations
+
+import argparse
 import json
 import os
+import signal
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import admission
+import job_ledger
+import lease_queue
+import ply_stream
+import tracing
 
 CONFIG_PATH = "config.json"
 SANITIZER_SCRIPT = "sanitize_trimesh.py"
 BLENDER_SCRIPT = "pipeline_hd.py"
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "pipeline" keys the sanitizer reads. Lattice and sweep keys are Blender-only, so
+# changing them re-runs the morph stage but not the sanitizer.
+SANITIZER_PIPELINE_KEYS = tuple(
+    "pipeline." + key
+    for key in (
+        "use_voxelization", "voxel_backend", "voxel_radius", "voxel_amount", "volume_threshold",
+        "volume_adaptivity", "smooth_iterations", "smooth_lambda", "smooth_mu", "smooth_weights",
+        "fill_holes", "max_hole_edges", "skip_voxelize_watertight", "optimize_order", "order_cache_size",
+        "estimate_normals", "normals_k", "normals_orient", "normals_sensor",
+    )
+)
+
+# Config each stage depends on (whole sections or "section.key"); a change re-runs the stage.
+STAGE_CONFIG_SECTIONS = {
+    "preview_sanitize": ("quality", "filtering", *SANITIZER_PIPELINE_KEYS, "preview"),
+    "preview_morph": ("pipeline", "preview"),
+    "sanitize": ("quality", "filtering", *SANITIZER_PIPELINE_KEYS),
+    "morph": ("pipeline",),
+}
+PREVIEW_STAGES = ("preview_sanitize", "preview_morph")
+
+_print_lock = threading.Lock()
+
+
+@dataclass
+class ScanJob:
+    """One scan's trip through sanitize → morph, with wall-clock timestamps."""
+
+    name: str
+    submitted: float = field(default_factory=time.perf_counter)
+    stage_times: dict[str, float] = field(default_factory=dict)
+    finished: float | None = None
+    failed_stage: str | None = None
+    current_stage: str | None = None  # last stage _run_stage entered
+    points_path: str | None = None  # vertices decoded during upload (ingest service)
+    preview_ready: bool = False
+    cancelled: bool = False
+    process: subprocess.Popen | None = field(default=None, repr=False)  # running stage child
+
+    @property
+    def obj_name(self) -> str:
+        return ply_stream.scan_stem(self.name) + ".obj"
+
+    @property
+    def glb_name(self) -> str:
+        return self.obj_name.replace(".obj", "_healed.glb")
+
+    @property
+    def preview_obj_name(self) -> str:
+        return self.obj_name.replace(".obj", "_preview.obj")
+
+    @property
+    def preview_glb_name(self) -> str:
+        return self.obj_name.replace(".obj", "_preview.glb")
+
+    @property
+    def latency(self) -> float:
+        return (self.finished or time.perf_counter()) - self.submitted
+
+    def cancel(self) -> None:
+        """Stop the job: the running stage (if any) is terminated and no further stages start."""
+        self.cancelled = True
+        proc = self.process
+        if proc is not None and proc.poll() is None:
+            _terminate_tree(proc, grace=0)
 
 
 def load_config(project_root: str) -> dict:
@@ -21,62 +112,556 @@ def load_config(project_root: str) -> dict:
         return json.load(f)
 
 
-def main() -> None:
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    os.chdir(project_root)
+def _log(job: ScanJob, text: str) -> None:
+    """Print a block of output prefixed with the scan name, without interleaving."""
+    prefix = f"[{job.name}] "
+    with _print_lock:
+        for line in text.rstrip().splitlines():
+            print(prefix + line)
 
-    config = load_config(project_root)
+
+def job_stages(config: dict) -> list[str]:
+    """Ledger stages a scan goes through under this config, in order."""
+    if config.get("preview", {}).get("enable", False):
+        return list(STAGE_CONFIG_SECTIONS)
+    return [s for s in STAGE_CONFIG_SECTIONS if s not in PREVIEW_STAGES]
+
+
+def folder_paths(project_root: str, config: dict) -> dict[str, str]:
+    """Absolute incoming / processing / outgoing folders from config.json."""
     folders = config.get("folders", {})
-    inc = folders.get("incoming", "1_Incoming")
-    proc = folders.get("processing", "2_Processing")
-    out = folders.get("outgoing", "3_Outgoing")
+    return {
+        "incoming": os.path.join(project_root, folders.get("incoming", "1_Incoming")),
+        "processing": os.path.join(project_root, folders.get("processing", "2_Processing")),
+        "outgoing": os.path.join(project_root, folders.get("outgoing", "3_Outgoing")),
+    }
+
+
+@dataclass
+class RunContext:
+    """Shared state for stage runs (one orchestrator run or one ingest server)."""
 
-    for rel_path in (inc, proc, out):
-        os.makedirs(os.path.join(project_root, rel_path), exist_ok=True)
+    project_root: str
+    config: dict
+    env: dict
+    ledger: job_ledger.JobLedger
+    blender_path: str
+    dirs: dict[str, str]
+    trace_dir: str | None = None
+    trace_id: str | None = None
+    leases: lease_queue.LeaseQueue | None = None  # set in lease mode: stage outputs are fenced
 
+
+def make_context(
+    project_root: str, config: dict, blender_path: str | None = None, recover: bool = True
+) -> RunContext:
+    """Create folders, open the ledger and (unless recover=False) recover stages left running by a crash."""
+    dirs = folder_paths(project_root, config)
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+    trace_cfg = config.get("trace", {})
+    trace_dir = trace_id = None
+    if trace_cfg.get("enable", False):
+        trace_dir = os.path.join(project_root, trace_cfg.get("dir", ".trace"))
+        trace_id = tracing.start_run(trace_dir)
+        tracing.process_name("orchestrator")
     env = os.environ.copy()
     env["RHINOVATE_PROJECT_ROOT"] = project_root
+    ledger = job_ledger.JobLedger(job_ledger.ledger_path(project_root, config))
+    recovered = ledger.recover() if recover else 0
+    if recovered:
+        print(f"[WARN] Resuming: {recovered} stage(s) were left running by an interrupted run.")
+    return RunContext(
+        project_root, config, env, ledger, blender_path or config.get("blender_path") or "", dirs, trace_dir, trace_id
+    )
 
-    print("==========================================")
-    print("RHINOVATE PIPELINE")
-    print("==========================================\n")
 
-    print(f"--- [Step 1/2] Sanitizer ({SANITIZER_SCRIPT}) ---")
+def finish_trace(ctx: RunContext) -> None:
+    """Merge the run's per-process trace files into one trace-event JSON."""
+    if ctx.trace_id:
+        path = tracing.merge(ctx.trace_dir, ctx.trace_id)
+        if path:
+            print(f"[OK] Trace: {os.path.relpath(path, ctx.project_root)} (open in chrome://tracing or ui.perfetto.dev)")
+
+
+def blender_command(blender_path: str, *script_args: str) -> list[str]:
+    """Command line for the morph stage. A .py blender_path is a stand-in run with this Python."""
+    prefix = [sys.executable, blender_path] if blender_path.endswith(".py") else [blender_path]
+    return prefix + ["--background", "--python", os.path.join(CODE_DIR, BLENDER_SCRIPT), "--", *script_args]
+
+
+def _stage_limits(config: dict, stage: str) -> tuple[float | None, int | None, int | None]:
+    """(timeout s, memory bytes, CPU s) for a stage from the "orchestrator" section; None = unlimited."""
+    orch = config.get("orchestrator", {})
+    base = stage.removeprefix("preview_")
+    timeout = orch.get("timeouts", {}).get(base)
+    memory_mb = orch.get("memory_limit_mb", {}).get(base)
+    cpu_s = orch.get("cpu_limit_s", {}).get(base)
+    return (
+        float(timeout) if timeout else None,
+        int(memory_mb) << 20 if memory_mb else None,
+        int(cpu_s) if cpu_s else None,
+    )
+
+
+def _apply_rlimits(pid: int, memory: int | None, cpu_s: int | None) -> None:
+    """Set address-space / CPU-time rlimits on a started child (inherited by its children).
+
+    Uses prlimit(2) from the parent rather than preexec_fn, which is unsafe with
+    the orchestrator's worker threads. Linux only; elsewhere limits are skipped.
+    """
+    if memory is None and cpu_s is None:
+        return
+    try:
+        import resource
+        prlimit = resource.prlimit
+    except (ImportError, AttributeError):
+        print("[WARN] Resource limits need Linux prlimit; running without them.")
+        return
+    if memory is not None:
+        prlimit(pid, resource.RLIMIT_AS, (memory, memory))
+    if cpu_s is not None:
+        # SIGXCPU at the soft limit, SIGKILL a little later if it is ignored.
+        prlimit(pid, resource.RLIMIT_CPU, (cpu_s, cpu_s + 5))
+
+
+def _terminate_tree(proc: subprocess.Popen, grace: float) -> None:
+    """Terminate a stage child and everything it spawned (Blender, helpers)."""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _run_child(
+    job: ScanJob, stage: str, cmd: list[str], ctx: RunContext, timeout: float | None, extra_env: dict | None = None
+) -> tuple[str, int | None, str | None]:
+    """Run a stage command in its own process group under the stage's limits.
+
+    Returns (output, returncode, reason); reason is set when the child was
+    stopped for timeout or cancellation.
+    """
+    _, memory, cpu_s = _stage_limits(ctx.config, stage)
+    group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" else {"start_new_session": True}
+    proc = subprocess.Popen(
+        cmd,
+        cwd=ctx.project_root,
+        env=tracing.child_env({**ctx.env, **(extra_env or {})}),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        **group,
+    )
+    job.process = proc
     try:
-        subprocess.run(
-            [sys.executable, SANITIZER_SCRIPT],
-            check=True,
-            cwd=project_root,
-            env=env,
+        _apply_rlimits(proc.pid, memory, cpu_s)
+        if job.cancelled:
+            _terminate_tree(proc, grace=0)
+        try:
+            output, _ = proc.communicate(timeout=timeout)
+            reason = "cancelled" if job.cancelled else None
+        except subprocess.TimeoutExpired:
+            _terminate_tree(proc, float(ctx.config.get("orchestrator", {}).get("kill_grace_s", 10)))
+            output, _ = proc.communicate()
+            reason = f"timed out after {timeout:.1f}s"
+    finally:
+        job.process = None
+    return output, proc.returncode, reason
+
+
+def _run_stage(
+    job: ScanJob,
+    stage: str,
+    cmd: list[str],
+    ctx: RunContext,
+    input_path: str,
+    output_path: str,
+    timeout: float | None = None,
+    required: bool = True,
+) -> bool:
+    """Run one stage subprocess for a job unless the ledger shows it done.
+
+    Records duration and ledger state; returns False on failure. A stage that is
+    not required (previews) does not mark the job failed. Under a lease the child
+    writes staged outputs, published only if the lease is still ours when it exits.
+    """
+    ledger = ctx.ledger
+    job.current_stage = stage
+    with tracing.span("ledger check", scan=job.name, stage=stage):
+        in_hash = job_ledger.file_hash(input_path)
+        cfg_hash = job_ledger.config_hash(ctx.config, STAGE_CONFIG_SECTIONS[stage])
+        done = ledger.is_done(job.name, stage, in_hash, cfg_hash)
+    if done:
+        job.stage_times[stage] = 0.0
+        _log(job, f"[SKIP] {stage} already done for this input and config (ledger).")
+        return True
+
+    if job.cancelled:
+        job.failed_stage = job.failed_stage or stage
+        return False
+    ledger.start(job.name, stage, in_hash, cfg_hash)
+    limit = _stage_limits(ctx.config, stage)[0]
+    if limit is not None:
+        timeout = min(timeout, limit) if timeout is not None else limit
+    tag = ctx.leases.token(job.name) if ctx.leases is not None else None
+    t0 = time.perf_counter()
+    with tracing.span(stage, scan=job.name):
+        output, returncode, reason = _run_child(
+            job, stage, cmd, ctx, timeout, {lease_queue.OUTPUT_TAG_ENV: tag} if tag else None
         )
-    except subprocess.CalledProcessError:
-        print("[FAIL] Sanitizer failed. Stopping pipeline.")
-        sys.exit(1)
+    job.stage_times[stage] = time.perf_counter() - t0
+    _log(job, output)
+    if tag and reason is None and returncode == 0 and not ctx.leases.holds(job.name):
+        reason = "lease lost to another node; outputs discarded"
+    if reason or returncode != 0 or not os.path.isfile(lease_queue.staged_path(output_path, tag)):
+        if tag:
+            lease_queue.discard_staged(ctx.dirs.values(), tag)
+        if reason is None:
+            if returncode < 0:
+                reason = f"killed by {signal.Signals(-returncode).name}"
+            elif returncode != 0:
+                reason = f"exit {returncode}"
+            else:
+                reason = "no output written"
+        ledger.fail(job.name, stage, reason)
+        if required or job.cancelled:
+            job.failed_stage = stage
+            _log(job, f"[FAIL] {stage} failed ({reason}).")
+        else:
+            _log(job, f"[WARN] {stage} failed ({reason}); continuing.")
+        return False
+    if tag:
+        lease_queue.publish_staged(ctx.dirs.values(), tag)
+    ledger.finish(job.name, stage, output_path)
+    return True
 
-    print("\n[OK] Sanitization complete. Handing off to Blender...\n")
 
-    blender_path = config.get("blender_path")
+def _print_summary(jobs: list[ScanJob], wall: float) -> None:
+    print("\n==========================================")
+    print("PER-SCAN SUMMARY")
+    print("==========================================")
+    print(f"   {'scan':<40} {'preview':>9} {'sanitize':>9} {'morph':>9} {'total':>9}  status")
+    for job in sorted(jobs, key=lambda j: j.submitted):
+        pre = sum(job.stage_times[s] for s in PREVIEW_STAGES if s in job.stage_times) if job.preview_ready else None
+        san = job.stage_times.get("sanitize")
+        mor = job.stage_times.get("morph")
+        if job.cancelled:
+            status = "cancelled"
+        else:
+            status = f"FAILED ({job.failed_stage})" if job.failed_stage else "ok"
+        print(
+            f"   {job.name:<40} "
+            f"{(f'{pre:.1f}s' if pre is not None else '-'):>9} "
+            f"{(f'{san:.1f}s' if san is not None else '-'):>9} "
+            f"{(f'{mor:.1f}s' if mor is not None else '-'):>9} "
+            f"{job.latency:>8.1f}s  {status}"
+        )
+    latencies = sorted(j.latency for j in jobs)
+    if latencies:
+        print(
+            f"   Latency: min {latencies[0]:.1f}s, median {latencies[len(latencies) // 2]:.1f}s, "
+            f"max {latencies[-1]:.1f}s; wall {wall:.1f}s for {len(jobs)} scan(s)"
+        )
+
+
+def preview_scan(job: ScanJob, ctx: RunContext) -> bool:
+    """Preview stages: downsampled sanitize + low-resolution morph → outgoing *_preview.glb.
+
+    Both stages share preview.time_budget_s; a failed or late preview never fails
+    the scan, the full-quality stages run regardless.
+    """
+    budget = float(ctx.config.get("preview", {}).get("time_budget_s", 15))
+    deadline = time.perf_counter() + budget
+    cmd = [sys.executable, os.path.join(CODE_DIR, SANITIZER_SCRIPT), job.name, "--preview"]
+    if job.points_path:
+        cmd += ["--points", job.points_path]
+    preview_obj = os.path.join(ctx.dirs["processing"], job.preview_obj_name)
+    if not _run_stage(
+        job, "preview_sanitize", cmd, ctx,
+        os.path.join(ctx.dirs["incoming"], job.name), preview_obj,
+        timeout=budget, required=False,
+    ):
+        return False
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        _log(job, f"[WARN] Preview budget ({budget:.0f}s) spent in sanitize; skipping preview morph.")
+        return False
+    job.preview_ready = _run_stage(
+        job, "preview_morph", blender_command(ctx.blender_path, job.preview_obj_name, "--preview"), ctx,
+        preview_obj, os.path.join(ctx.dirs["outgoing"], job.preview_glb_name),
+        timeout=remaining, required=False,
+    )
+    if job.preview_ready:
+        _log(job, f"[OK] Preview ready: {job.preview_glb_name} ({job.latency:.1f}s after submit)")
+    return job.preview_ready
+
+
+def sanitize_scan(job: ScanJob, ctx: RunContext) -> bool:
+    """Sanitize stage: incoming PLY → processing OBJ."""
+    cmd = [sys.executable, os.path.join(CODE_DIR, SANITIZER_SCRIPT), job.name]
+    if job.points_path:
+        cmd += ["--points", job.points_path]
+    ok = _run_stage(
+        job,
+        "sanitize",
+        cmd,
+        ctx,
+        os.path.join(ctx.dirs["incoming"], job.name),
+        os.path.join(ctx.dirs["processing"], job.obj_name),
+    )
+    if not ok:
+        job.finished = time.perf_counter()
+    return ok
+
+
+def morph_scan(job: ScanJob, ctx: RunContext) -> bool:
+    """Morph stage: processing OBJ → outgoing *_healed.glb via Blender."""
+    ok = _run_stage(
+        job,
+        "morph",
+        blender_command(ctx.blender_path, job.obj_name),
+        ctx,
+        os.path.join(ctx.dirs["processing"], job.obj_name),
+        os.path.join(ctx.dirs["outgoing"], job.glb_name),
+    )
+    job.finished = time.perf_counter()
+    return ok
+
+
+def _scan_error(fut: Future) -> BaseException | None:
+    """Exception raised by a scan's sanitize future or the morph it queued (waits for both)."""
+    if fut.exception() is not None:
+        return fut.exception()
+    return fut.result().exception() if fut.result() is not None else None
+
+
+def _stage_raised(job: ScanJob, ctx: RunContext, error: BaseException) -> None:
+    """A stage raised instead of returning False: fail it like a failed child, so the batch goes on."""
+    stage = job.current_stage or job_stages(ctx.config)[0]
+    ctx.ledger.fail(job.name, stage, f"{type(error).__name__}: {error}")
+    job.failed_stage = job.failed_stage or stage
+    job.finished = job.finished or time.perf_counter()
+    _log(job, f"[FAIL] {stage} raised {type(error).__name__}: {error}")
+
+
+def _scan_finished(fut: Future) -> bool:
+    """A scan's sanitize future is done and so is the morph it queued, if any."""
+    if not fut.done():
+        return False
+    if fut.exception() is not None or fut.result() is None:
+        return True
+    return fut.result().done()
+
+
+def _drain_leased(
+    leases: lease_queue.LeaseQueue,
+    list_scans,
+    start_job,
+    by_name: dict[str, ScanJob],
+    capacity: int,
+    ctx: RunContext,
+) -> None:
+    """Claim and run scans until every scan in the folder has a done marker.
+
+    At most `capacity` scans are held at once, so other nodes get the rest. Scans
+    leased by live nodes are waited for, so an abandoned lease is picked up here
+    once it expires.
+    """
+    active: dict[str, Future] = {}
+    poll = min(1.0, leases.heartbeat_s)
+    waiting_logged = 0
+    leases.start()
+    while True:
+        for name in list_scans():
+            if len(active) >= capacity:
+                break
+            if name not in by_name and leases.claim(name):
+                active[name] = start_job(name)
+        for name, fut in list(active.items()):
+            if _scan_finished(fut):
+                job = by_name[name]
+                error = _scan_error(fut)
+                if error is not None:
+                    _stage_raised(job, ctx, error)
+                ok = not job.failed_stage and not job.cancelled
+                leases.complete(name, "ok" if ok else "failed")
+                del active[name]
+        elsewhere = [n for n in list_scans() if n not in by_name and not leases.is_done(n)]
+        if not active and not elsewhere:
+            return
+        if not active and len(elsewhere) != waiting_logged:
+            print(f"Waiting on {len(elsewhere)} scan(s) leased by other nodes...")
+            waiting_logged = len(elsewhere)
+        time.sleep(poll)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Rhinovate pipeline orchestrator.")
+    parser.add_argument("--root", help="project root (default: this directory)")
+    parser.add_argument("--blender", help="override blender_path (a .py stand-in is run with this Python)")
+    args = parser.parse_args(argv)
+
+    project_root = os.path.abspath(args.root or CODE_DIR)
+    os.chdir(project_root)
+
+    config = load_config(project_root)
+    out = config.get("folders", {}).get("outgoing", "3_Outgoing")
+
+    orch = config.get("orchestrator", {})
+    sanitize_workers = max(1, int(orch.get("sanitize_workers", 1)))
+    morph_workers = max(1, int(orch.get("morph_workers", 1)))
+    gate = admission.MemoryGate(orch.get("memory_budget_mb", 0))
+
+    print("==========================================")
+    print("RHINOVATE PIPELINE")
+    print("==========================================\n")
+
+    blender_path = args.blender or config.get("blender_path")
     if not blender_path or not os.path.isfile(blender_path):
         print(f"[FAIL] Blender not found: {blender_path}")
         print("   Update blender_path in config.json.")
         sys.exit(1)
 
-    print(f"--- [Step 2/2] Morph engine ({BLENDER_SCRIPT}) ---")
-    try:
-        subprocess.run(
-            [blender_path, "--background", "--python", BLENDER_SCRIPT],
-            check=True,
-            cwd=project_root,
-            env=env,
-        )
-    except subprocess.CalledProcessError:
-        print("[FAIL] Blender engine failed.")
+    leases = lease_queue.from_config(project_root, config, on_lost=lambda scan: _lease_lost(scan))
+    ledger_file = os.path.abspath(job_ledger.ledger_path(project_root, config))
+    if leases is not None and os.path.commonpath([ledger_file, project_root]) == project_root:
+        print(f"[FAIL] Lease mode needs a node-local job ledger, not one in the shared project folder: {ledger_file}")
+        print("   Unset orchestrator.ledger (defaults to ~/.rhinovate/) or point it outside the project.")
         sys.exit(1)
+    # Other nodes' running stages are not crashed ones, so only a lone run resets them.
+    ctx = make_context(project_root, config, blender_path, recover=leases is None)
+    ctx.leases = leases
+    inc_dir = ctx.dirs["incoming"]
+    estimates: dict[str, float] = {}
+
+    def list_scans() -> list[str]:
+        names = sorted(f for f in os.listdir(inc_dir) if ply_stream.is_scan_file(f))
+        for name in names:
+            if name not in estimates:
+                estimates[name] = admission.sanitize_estimate_mb(os.path.join(inc_dir, name), config)
+        if gate.budget_mb:
+            names.sort(key=lambda name: (estimates[name], name))  # smallest first keeps median latency low
+        return names
+
+    plies = list_scans()
+    if not plies:
+        print(f"[WARN] No .ply files in '{os.path.relpath(inc_dir, project_root)}'. Add scans and re-run.")
+        sys.exit(1)
+
+    preview = config.get("preview", {}).get("enable", False)
+    if gate.budget_mb:
+        print(f"Memory budget: {gate.budget_mb:.0f} MB; largest sanitize estimate {max(estimates.values()):.0f} MB")
+    if leases is not None:
+        print(f"Lease queue: node {leases.node}, {os.path.relpath(leases.directory, project_root)}/ "
+              f"(ttl {leases.ttl_s:g}s, heartbeat {leases.heartbeat_s:g}s)")
+
+    print(
+        f"Dispatching {len(plies)} scan(s): sanitize x{sanitize_workers} "
+        f"({SANITIZER_SCRIPT}) → morph x{morph_workers} ({BLENDER_SCRIPT})\n"
+    )
+
+    def admitted(job: ScanJob, stage: str, mb: float, fn, *args):
+        """Run fn under the memory gate, logging if the stage has to wait for room."""
+        def on_wait(depth: int, in_use: float) -> None:
+            _log(job, f"Waiting for memory: {stage} needs ~{mb:.0f} MB, "
+                      f"{in_use:.0f}/{gate.budget_mb:.0f} MB in use, {depth} queued")
+        gate.acquire(mb, on_wait)
+        try:
+            return fn(*args)
+        finally:
+            gate.release(mb)
 
+    def sanitize_and_preview(job: ScanJob) -> bool:
+        if preview:
+            preview_scan(job, ctx)
+        return sanitize_scan(job, ctx)
+
+    def morph(job: ScanJob) -> bool:
+        mb = admission.morph_estimate_mb(os.path.join(ctx.dirs["processing"], job.obj_name), config)
+        return admitted(job, "morph", mb, morph_scan, job, ctx)
+
+    def sanitize(job: ScanJob) -> Future | None:
+        if not admitted(job, "sanitize", estimates[job.name], sanitize_and_preview, job):
+            return None
+        _log(job, "[OK] Sanitized. Queued for morph engine.")
+        return morph_pool.submit(morph, job)
+
+    jobs: list[ScanJob] = []
+    by_name: dict[str, ScanJob] = {}
+
+    def _lease_lost(scan: str) -> None:
+        job = by_name.get(scan)
+        if job is not None and job.finished is None:
+            _log(job, "[WARN] Lease lost to another node; stopping this scan.")
+            job.cancel()
+
+    def start_job(name: str) -> Future:
+        job = ScanJob(name)
+        jobs.append(job)
+        by_name[name] = job
+        for stage in job_stages(config):
+            ctx.ledger.enqueue(name, stage)
+        return sanitize_pool.submit(sanitize, job)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(sanitize_workers, thread_name_prefix="sanitize") as sanitize_pool, \
+            ThreadPoolExecutor(morph_workers, thread_name_prefix="morph") as morph_pool:
+        try:
+            if leases is None:
+                pending = {name: start_job(name) for name in plies}
+                for name, fut in pending.items():
+                    error = _scan_error(fut)
+                    if error is not None:
+                        _stage_raised(by_name[name], ctx, error)
+            else:
+                _drain_leased(leases, list_scans, start_job, by_name, sanitize_workers + morph_workers, ctx)
+        except KeyboardInterrupt:
+            print("\n[WARN] Interrupted: stopping running stages...")
+            for job in jobs:
+                job.cancel()
+            gate.cancel_all()
+            sanitize_pool.shutdown(cancel_futures=True)
+            morph_pool.shutdown(cancel_futures=True)
+        finally:
+            if leases is not None:
+                leases.stop()  # unfinished leases go back to the queue
+
+    ctx.ledger.close()
+    _print_summary(jobs, time.perf_counter() - t0)
+    if gate.budget_mb:
+        print(
+            f"   Admission: budget {gate.budget_mb:.0f} MB, peak estimate {gate.peak_mb:.0f} MB; "
+            f"{gate.admitted} stage(s) admitted, {gate.blocked} blocked (max queue depth {gate.max_queue})"
+        )
+    if leases is not None:
+        others = sum(1 for name in list_scans() if name not in by_name and leases.is_done(name))
+        print(
+            f"   Leases: {len(jobs)} scan(s) claimed by this node ({leases.stolen} from abandoned leases), "
+            f"{len(leases.lost)} lost to other nodes, {others} done elsewhere"
+        )
+    finish_trace(ctx)
+
+    lost = leases.lost if leases is not None else set()
+    failed = [job.name for job in jobs if (job.failed_stage or job.cancelled) and job.name not in lost]
     print("\n==========================================")
-    print("PIPELINE FINISHED")
-    print(f"   Output: {out}/ (*_healed.glb)")
+    if failed:
+        print(f"PIPELINE FINISHED WITH FAILURES: {', '.join(failed)}")
+    else:
+        print("PIPELINE FINISHED")
+    print(f"   Output: {out}/ (*_healed.glb{', *_preview.glb' if preview else ''})")
     print("==========================================")
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
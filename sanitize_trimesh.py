@@ -2,16 +2,30 @@
 Rhinovate sanitizer: PLY → cleaned OBJ.
 Loads iOS LiDAR PLY, repairs bad vertex indices / degenerate geometry, strips broken
 colors, exports to OBJ for the Blender pipeline. Uses config.json via RHINOVATE_PROJECT_ROOT.
+Also accepts .ply.gz / .ply.bz2 / .ply.xz, decompressed on the fly while parsing.
+With --preview, writes a coarse <stem>_preview.obj from a heavily downsampled cloud.
 """
 from __future__ import annotations
 
+import argparse
 import json
 import os
 import sys
+import time
 
 import numpy as np
 import trimesh
 
+import hole_fill
+import lease_queue
+import mesh_order
+import normals
+import ply_stream
+import smoothing
+import sparse_volume
+import tiled_filter
+import tracing
+
 CONFIG_NAME = "config.json"
 
 
@@ -27,9 +41,247 @@ def _load_config() -> dict:
         return json.load(f)
 
 
+def _quality_metrics(vertices: np.ndarray, quality_cfg: dict) -> dict:
+    """Cheap scan metrics: count, extent, spacing from a sampled k-NN, and the share of
+    points in the largest connected blob of dense cells in a coarse occupancy grid
+    (cells holding at least dense_cell_ratio × the fullest cell's count)."""
+    n = len(vertices)
+    metrics = {"points": n, "extent": 0.0, "spacing": None, "dominant_fraction": 0.0}
+    if n < 2:
+        return metrics
+    lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    metrics["extent"] = float(np.linalg.norm(hi - lo))
+
+    from scipy.ndimage import label
+    from scipy.spatial import cKDTree
+
+    # Spacing: median NN distance in a random sample, scaled to full density (surface: ∝ 1/sqrt(N)).
+    s = min(n, int(quality_cfg.get("sample_points", 20000)))
+    sample = vertices[np.random.default_rng(0).choice(n, size=s, replace=False)]
+    nn, _ = cKDTree(sample).query(sample, k=2)
+    metrics["spacing"] = float(np.median(nn[:, 1]) * np.sqrt(s / n))
+
+    bins = int(quality_cfg.get("grid_bins", 32))
+    cell = max(float((hi - lo).max()) / bins, 1e-12)
+    shape = tuple(int(v) for v in np.floor((hi - lo) / cell).astype(np.int64) + 1)
+    idx = np.floor((vertices - lo) / cell).astype(np.int64)
+    flat = np.ravel_multi_index((idx[:, 0], idx[:, 1], idx[:, 2]), shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape)))
+    dense = max(2.0, float(quality_cfg.get("dense_cell_ratio", 0.05)) * counts.max())
+    blobs, _ = label(counts.reshape(shape) >= dense, structure=np.ones((3, 3, 3)))
+    per_blob = np.bincount(blobs.ravel(), weights=counts)[1:]
+    metrics["dominant_fraction"] = float(per_blob.max() / n) if len(per_blob) else 0.0
+    return metrics
+
+
+def _quality_gate(mesh, filename: str, output_folder: str, config: dict) -> bool:
+    """Score the raw scan and reject it (or only flag it) when below the "quality" thresholds.
+    Metrics and failed checks go to <stem>_quality.json next to the output."""
+    quality_cfg = config.get("quality", {})
+    vertices = np.asarray(mesh.vertices)
+    t0 = time.perf_counter()
+    m = _quality_metrics(vertices, quality_cfg)
+    checks = [
+        ("points", m["points"] < quality_cfg.get("min_points", 0), f"{m['points']} points < min_points"),
+        ("extent", m["extent"] < quality_cfg.get("min_extent", 0), f"extent {m['extent']:.3g} < min_extent"),
+        ("extent", m["extent"] > quality_cfg.get("max_extent", float("inf")), f"extent {m['extent']:.3g} > max_extent"),
+        ("spacing", m["spacing"] is not None and m["spacing"] > quality_cfg.get("max_spacing", float("inf")),
+         f"spacing {m['spacing'] or 0:.3g} > max_spacing"),
+        ("dominant_fraction", m["dominant_fraction"] < quality_cfg.get("min_dominant_fraction", 0),
+         f"{m['dominant_fraction']:.0%} of points in the main region < min_dominant_fraction"),
+    ]
+    failed = [msg for _, bad, msg in checks if bad]
+    spacing = f"{m['spacing']:.3g}" if m["spacing"] is not None else "-"
+    print(f"   Quality: {m['points']} points, extent {m['extent']:.3g}, spacing {spacing}, "
+          f"main region {m['dominant_fraction']:.0%} ({time.perf_counter() - t0:.2f}s)")
+
+    reject = bool(failed) and quality_cfg.get("action", "reject") == "reject"
+    report = {**m, "failed": failed, "rejected": reject}
+    report_path = os.path.join(output_folder, ply_stream.scan_stem(filename) + "_quality.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for msg in failed:
+        print(f"   {'[FAIL]' if reject else '[WARN]'} Quality: {msg}")
+    return not reject
+
+
+def _dedup_points(vertices: np.ndarray, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """Merge points that share a tolerance-sized grid cell into their mean.
+
+    Coordinates are quantized and packed into int64 keys (sparse_volume.pack_coords),
+    so a single np.unique over N integers replaces any per-point work. Merged points
+    keep the input order of each cell's first point; that point's index is returned
+    alongside, so callers can map the result back to the input.
+    """
+    center = 0.5 * (vertices.min(axis=0) + vertices.max(axis=0))
+    ijk = np.floor((vertices - center) / tolerance).astype(np.int64)
+    if np.abs(ijk).max() < (1 << 20):  # fits pack_coords' 21 bits per axis
+        _, first, inverse, counts = np.unique(
+            sparse_volume.pack_coords(ijk), return_index=True, return_inverse=True, return_counts=True
+        )
+    else:
+        _, first, inverse, counts = np.unique(ijk, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    merged = np.empty((len(counts), 3), dtype=np.float64)
+    for axis in range(3):
+        merged[:, axis] = np.bincount(inverse, weights=vertices[:, axis], minlength=len(counts)) / counts
+    order = np.argsort(first, kind="stable")  # unique() returns key order; restore input order
+    return merged[order], first[order]
+
+
+def _sq_dist(vertices: np.ndarray, center: np.ndarray) -> np.ndarray:
+    """Squared distance of every vertex to center, one axis at a time (no (N, 3) temporary)."""
+    d2 = np.square(vertices[:, 0] - center[0])
+    for axis in (1, 2):
+        d2 += np.square(vertices[:, axis] - center[axis])
+    return d2
+
+
+def _roi_crop(vertices: np.ndarray, active: np.ndarray | None, filter_config: dict) -> np.ndarray:
+    """Keep points within roi_radius of the densest region (the face).
+
+    A coarse occupancy histogram (roi_bins cells along the longest axis), box
+    smoothed over 3×3×3 cells, gives the densest cell; one mean-shift step
+    re-centers on the points around it. Costs O(N), so SOR / DBSCAN only see
+    the face region instead of walls and clutter. Works on the whole buffer and
+    counts only the active points (all when active is None), so nothing is
+    gathered; the grid spans the whole buffer's bounds. Returns a mask over the
+    active points.
+    """
+    radius = float(filter_config.get("roi_radius", 0.2))
+    bins = int(filter_config.get("roi_bins", 32))
+    lo = vertices.min(axis=0)
+    extent = vertices.max(axis=0) - lo
+    cell = max(float(extent.max()) / bins, radius / 4, 1e-9)
+    shape = tuple(int(n) for n in np.floor(extent / cell).astype(np.int64) + 1)
+    flat = np.zeros(len(vertices), dtype=np.int64)
+    for axis in range(3):  # C-order cell index, same as np.ravel_multi_index
+        flat *= shape[axis]
+        flat += np.floor((vertices[:, axis] - lo[axis]) / cell).astype(np.int64)
+    cells = flat if active is None else flat[active]
+    counts = np.bincount(cells, minlength=int(np.prod(shape))).reshape(shape).astype(np.float32)
+    try:
+        from scipy.ndimage import uniform_filter
+        counts = uniform_filter(counts, size=3, mode="constant")
+    except ImportError:
+        pass
+    peak = np.array(np.unravel_index(int(np.argmax(counts)), shape))
+    center = lo + (peak + 0.5) * cell
+
+    def near_center(center: np.ndarray) -> np.ndarray:
+        d2 = _sq_dist(vertices, center)
+        return (d2 if active is None else d2[active]) <= radius * radius
+
+    near = near_center(center)
+    if near.any():
+        center = vertices[np.flatnonzero(near) if active is None else active[near]].mean(axis=0)
+        near = near_center(center)
+    return near
+
+
+def _gather(vertices: np.ndarray, active: np.ndarray | None) -> np.ndarray:
+    """The active points as one contiguous array (the buffer itself when all are active)."""
+    return vertices if active is None else vertices[active]
+
+
+def _sor_stage(vertices: np.ndarray, active: np.ndarray | None, filter_config: dict) -> np.ndarray:
+    """Statistical outlier removal: drop points whose mean k-NN distance is above mean + std_ratio·std."""
+    from scipy.spatial import cKDTree
+
+    points = _gather(vertices, active)
+    k_neighbors = int(filter_config.get("k_neighbors", 20))
+    std_ratio = float(filter_config.get("std_ratio", 2.0))
+    distances, _ = cKDTree(points).query(points, k=k_neighbors + 1)  # +1 because point queries itself
+    mean_distances = np.mean(distances[:, 1:], axis=1)  # Exclude self-distance
+    threshold = np.mean(mean_distances) + std_ratio * np.std(mean_distances)
+    return mean_distances < threshold
+
+
+def _cluster_stage(vertices: np.ndarray, active: np.ndarray | None, filter_config: dict) -> np.ndarray | None:
+    """Keep only the largest DBSCAN cluster (the face); eps = 3× the mean nearest-neighbour distance."""
+    if (len(vertices) if active is None else len(active)) <= 100:
+        return None
+    from scipy.spatial import cKDTree
+    from sklearn.cluster import DBSCAN
+
+    points = _gather(vertices, active)
+    nn_distances, _ = cKDTree(points).query(points, k=2)
+    eps = np.mean(nn_distances[:, 1]) * 3.0
+    labels = DBSCAN(eps=eps, min_samples=10).fit(points).labels_
+    unique, counts = np.unique(labels[labels >= 0], return_counts=True)
+    if len(unique) == 0:
+        return None
+    return labels == unique[np.argmax(counts)]
+
+
+def _roi_stage(vertices: np.ndarray, active: np.ndarray | None, filter_config: dict) -> np.ndarray | None:
+    """_roi_crop, skipped when it would keep fewer than roi_min_points."""
+    keep = _roi_crop(vertices, active, filter_config)
+    min_points = int(filter_config.get("roi_min_points", 1000))
+    if int(keep.sum()) < min(min_points, len(keep)):
+        print(f"   [WARN] ROI crop kept only {int(keep.sum())} points; skipping crop")
+        return None
+    return keep
+
+
+def _tiled_stage(vertices: np.ndarray, active: np.ndarray | None, filter_config: dict) -> np.ndarray | None:
+    """SOR + largest cluster over spatial tiles in worker processes (tiled_filter.py);
+    below tile_min_points it runs the serial sor and cluster stages instead."""
+    count = len(vertices) if active is None else len(active)
+    if count >= int(filter_config.get("tile_min_points", 500000)):
+        return tiled_filter.filter_mask(vertices, filter_config, active)
+    keep = _sor_stage(vertices, active, filter_config)
+    if filter_config.get("keep_largest_cluster", True):
+        survivors = np.flatnonzero(keep)
+        cluster = _cluster_stage(vertices, survivors if active is None else active[survivors], filter_config)
+        if cluster is not None:
+            keep[survivors[~cluster]] = False
+    return keep
+
+
+# Point-cloud filter stages: fn(vertices, active, filter_config), where vertices is
+# the whole loaded buffer and active the indices still kept (None = all). Returns a
+# boolean mask over the active points, an index array into them, or None (keep all).
+FILTER_STAGES = {
+    "roi_crop": _roi_stage,
+    "sor": _sor_stage,
+    "cluster": _cluster_stage,
+    "tiled": _tiled_stage,
+}
+
+
+def _filter_chain(filter_config: dict) -> list[tuple[str, dict]]:
+    """(stage, config) pairs from filtering.stages, or the default chain from the legacy flags.
+
+    A stage is a name or a dict {"stage": name, ...overrides of the filtering keys}.
+    """
+    stages = filter_config.get("stages")
+    if stages is None:
+        stages = ["roi_crop"] if filter_config.get("roi_crop", False) else []
+        if int(filter_config.get("tiles", 1)) > 1:
+            stages.append("tiled")
+        else:
+            stages.append("sor")
+            if filter_config.get("keep_largest_cluster", True):
+                stages.append("cluster")
+    chain = []
+    for entry in stages:
+        name, overrides = (entry, {}) if isinstance(entry, str) else (entry.get("stage"), entry)
+        if name not in FILTER_STAGES:
+            raise ValueError(f"unknown filter stage {name!r} (use one of {', '.join(FILTER_STAGES)})")
+        chain.append((name, {**filter_config, **{k: v for k, v in overrides.items() if k != "stage"}}))
+    return chain
+
+
 def _filter_noise(mesh, config: dict) -> trimesh.PointCloud | trimesh.Trimesh:
     """Filter noise from point cloud to isolate dense face region.
-    Returns a new mesh/pointcloud with outliers removed.
+    Runs the filtering.stages chain over the loaded vertex buffer and an index
+    array of the points still active. Each stage gets both and returns a mask or
+    indices over the active points, composed into that index array. roi_crop reads
+    the buffer through the index; the k-NN stages (sor, cluster, tiled) gather the
+    active points into the contiguous array their k-d tree needs (tiled gathers
+    straight into shared memory). The result is gathered once at the end.
+    Returns a new, centered point cloud.
     """
     if not isinstance(mesh, trimesh.PointCloud):
         # If it's already a mesh, convert to point cloud for filtering
@@ -49,58 +301,231 @@ def _filter_noise(mesh, config: dict) -> trimesh.PointCloud | trimesh.Trimesh:
 
     print(f"   Filtering noise (initial: {len(vertices)} vertices)...")
 
-    # Method 1: Statistical outlier removal
-    # Remove points where average distance to k neighbors is > threshold
-    k_neighbors = filter_config.get("k_neighbors", 20)
-    std_ratio = filter_config.get("std_ratio", 2.0)
+    active = None  # indices into vertices still kept; None = all of them (no gather needed)
+    for name, stage_config in _filter_chain(filter_config):
+        count = len(vertices) if active is None else len(active)
+        if count == 0:
+            break
+        t0 = time.perf_counter()
+        with tracing.span(f"filter {name}", points=count):
+            try:
+                result = FILTER_STAGES[name](vertices, active, stage_config)
+            except Exception as e:
+                print(f"   [WARN] Filter stage {name} failed: {e}")
+                continue
+        if result is not None:
+            if active is None:
+                active = np.flatnonzero(result) if result.dtype == bool else np.asarray(result)
+            else:
+                active = active[result]
+        kept = len(vertices) if active is None else len(active)
+        print(f"   Stage {name}: {count} → {kept} vertices ({time.perf_counter() - t0:.2f}s)")
+
+    # Single gather, then center in place
+    vertices_filtered = vertices.copy() if active is None else vertices[active]
+    metadata = {}
+    source_index = mesh.metadata.get("source_index")
+    if source_index is not None:  # keep the map back to the loaded scan's point order
+        metadata["source_index"] = source_index if active is None else source_index[active]
+    if len(vertices_filtered) > 0:
+        center = np.mean(vertices_filtered, axis=0)
+        vertices_filtered -= center
+        print(f"   Centered mesh (offset: {center})")
+        metadata["center_offset"] = center
+
+    return trimesh.PointCloud(vertices=vertices_filtered, metadata=metadata)
 
+
+def _filter_mesh(mesh: trimesh.Trimesh, config: dict) -> trimesh.Trimesh:
+    """Mesh counterpart of _filter_noise that keeps face topology.
+    Faces whose longest edge is an outlier (above median + std_ratio·1.4826·MAD)
+    are cut from the face adjacency, and the remaining faces are split into
+    components; components smaller than mesh_min_component_ratio × the largest
+    are dropped. A run of adjacent long faces survives when it borders kept faces
+    and no dropped ones, so long faces only go together with the debris they
+    attach; a clean mesh (long faces or not) comes back unchanged.
+    """
+    filter_config = config.get("filtering", {})
+    if not filter_config.get("enable", True) or len(mesh.faces) == 0:
+        return mesh
     try:
-        from scipy.spatial import cKDTree
-        tree = cKDTree(vertices)
-        distances, _ = tree.query(vertices, k=k_neighbors + 1)  # +1 because point queries itself
-        mean_distances = np.mean(distances[:, 1:], axis=1)  # Exclude self-distance
-        mean_global = np.mean(mean_distances)
-        std_global = np.std(mean_distances)
-        threshold = mean_global + std_ratio * std_global
-        mask = mean_distances < threshold
-        vertices_filtered = vertices[mask]
-        print(f"   After outlier removal: {len(vertices_filtered)} vertices")
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
     except ImportError:
-        print("   [WARN] scipy not available, skipping outlier removal")
-        vertices_filtered = vertices
+        print("   [WARN] scipy not available, skipping mesh filtering")
+        return mesh
 
-    # Method 2: Keep only the largest dense cluster (the face)
-    keep_largest_cluster = filter_config.get("keep_largest_cluster", True)
-    if keep_largest_cluster and len(vertices_filtered) > 100:
-        try:
-            from sklearn.cluster import DBSCAN
-            # Use adaptive eps based on point density
-            # Estimate average nearest neighbor distance
-            tree2 = cKDTree(vertices_filtered)
-            nn_distances, _ = tree2.query(vertices_filtered, k=2)
-            avg_nn_dist = np.mean(nn_distances[:, 1])  # Exclude self
-            eps = avg_nn_dist * 3.0  # 3x average NN distance
-
-            clustering = DBSCAN(eps=eps, min_samples=10).fit(vertices_filtered)
-            labels = clustering.labels_
-
-            # Find largest cluster (excluding noise label -1)
-            unique, counts = np.unique(labels[labels >= 0], return_counts=True)
-            if len(unique) > 0:
-                largest_cluster = unique[np.argmax(counts)]
-                mask_cluster = labels == largest_cluster
-                vertices_filtered = vertices_filtered[mask_cluster]
-                print(f"   After cluster filtering: {len(vertices_filtered)} vertices (largest cluster)")
-        except (ImportError, Exception) as e:
-            print(f"   [WARN] Cluster filtering failed: {e}")
+    print(f"   Filtering mesh (initial: {len(mesh.faces)} faces)...")
+    std_ratio = float(filter_config.get("std_ratio", 2.0))
+    edges = mesh.vertices[mesh.faces] - mesh.vertices[np.roll(mesh.faces, -1, axis=1)]
+    longest = np.sqrt(np.einsum("fij,fij->fi", edges, edges)).max(axis=1)
+    median = np.median(longest)
+    long = longest > median + std_ratio * 1.4826 * np.median(np.abs(longest - median))
+
+    nf = len(mesh.faces)
+    adj = mesh.face_adjacency
+    inner = adj[~long[adj[:, 0]] & ~long[adj[:, 1]]]
+    graph = coo_matrix((np.ones(len(inner), dtype=np.int8), (inner[:, 0], inner[:, 1])), shape=(nf, nf))
+    _, labels = connected_components(graph, directed=False)
+    sizes = np.bincount(labels[~long], minlength=labels.max() + 1)
+    big = sizes >= float(filter_config.get("mesh_min_component_ratio", 0.05)) * sizes.max()
+    keep = ~long & big[labels]
+
+    # Runs of adjacent long faces: keep a run that borders kept faces and no dropped ones.
+    both_long = adj[long[adj[:, 0]] & long[adj[:, 1]]]
+    graph = coo_matrix((np.ones(len(both_long), dtype=np.int8), (both_long[:, 0], both_long[:, 1])), shape=(nf, nf))
+    _, runs = connected_components(graph, directed=False)
+    dropped = ~long & ~keep
+    run_kept = np.zeros(runs.max() + 1, dtype=bool)
+    run_dropped = np.zeros(runs.max() + 1, dtype=bool)
+    for a, b in (adj.T, adj.T[::-1]):
+        edge_long = long[a]
+        run_kept[runs[a[edge_long & keep[b]]]] = True
+        run_dropped[runs[a[edge_long & dropped[b]]]] = True
+    keep |= long & run_kept[runs] & ~run_dropped[runs]
+
+    if not keep.all():
+        mesh.update_faces(keep)
+        mesh.remove_unreferenced_vertices()
+        kept_long = int((keep & long).sum())
+        print(f"   After outlier filtering: {len(mesh.faces)} faces "
+              f"({int(big.sum())} of {int((sizes > 0).sum())} components, {kept_long} of {int(long.sum())} long faces kept)")
 
     # Center the mesh at origin
-    if len(vertices_filtered) > 0:
-        center = np.mean(vertices_filtered, axis=0)
-        vertices_filtered = vertices_filtered - center
+    if len(mesh.vertices) > 0:
+        center = mesh.vertices.mean(axis=0)
+        mesh.apply_translation(-center)
         print(f"   Centered mesh (offset: {center})")
+    return mesh
+
+
+def _load_compressed(path: str):
+    """Load a compressed scan without writing an uncompressed copy.
+    Point clouds are streamed through the incremental PLY parser; meshes (or
+    layouts the parser does not handle) go to trimesh via a decompressing reader,
+    the parser having read only their header.
+    """
+    try:
+        parser = ply_stream.parse_file(path)
+        if not parser.has_faces:
+            vertices = parser.finish()
+            print(f"   Streamed {os.path.basename(path)} ({parser.vertices_seen} vertices decompressed on the fly)")
+            return trimesh.PointCloud(vertices=vertices)
+    except ply_stream.PlyFormatError as e:
+        print(f"   [WARN] Streaming parse failed ({e}); falling back to trimesh")
+    with ply_stream.open_scan(path) as f:
+        scene = trimesh.load(f, file_type="ply", force="scene")
+    if len(scene.geometry) == 0:
+        return None
+    return scene.geometry[list(scene.geometry.keys())[0]]
+
+
+def _morton_order(vertices: np.ndarray) -> np.ndarray:
+    """Permutation that sorts points along a Z-order curve over their bounding cube.
+    Nearby points end up nearby in memory, so k-d tree builds, k-NN queries and
+    DBSCAN neighbourhood scans touch far fewer cache lines than in capture order."""
+    lo = vertices.min(axis=0)
+    scale = ((1 << 21) - 1) / max(float((vertices.max(axis=0) - lo).max()), 1e-12)
+    ijk = ((vertices - lo) * scale).astype(np.int64)
+    return np.argsort(sparse_volume.morton_keys(ijk), kind="stable")
+
+
+def _downsample(mesh, max_points: int):
+    """Random subset of at most max_points vertices (fixed seed, so previews are repeatable).
+    Meshes with faces are returned as is; subsampling would break their topology.
+    """
+    if isinstance(mesh, trimesh.Trimesh) and len(mesh.faces) > 0:
+        return mesh
+    vertices = np.asarray(mesh.vertices)
+    if len(vertices) <= max_points:
+        return trimesh.PointCloud(vertices=vertices)
+    keep = np.random.default_rng(0).choice(len(vertices), size=max_points, replace=False)
+    keep.sort()
+    print(f"   Preview: downsampled {len(vertices)} → {max_points} points")
+    return trimesh.PointCloud(vertices=vertices[keep])
+
+
+def _point_normals(mesh, pipeline_cfg: dict) -> np.ndarray | None:
+    """PCA normals for a point cloud, oriented per normals_orient; None for meshes."""
+    if not isinstance(mesh, trimesh.PointCloud) or len(mesh.vertices) == 0:
+        return None
+    t0 = time.perf_counter()
+    points = np.asarray(mesh.vertices)
+    point_normals = normals.estimate_normals(points, k=int(pipeline_cfg.get("normals_k", 16)))
+    sensor = pipeline_cfg.get("normals_sensor")
+    if sensor is not None:
+        # normals_sensor is in scan coordinates; the cloud has been centered since.
+        sensor = np.asarray(sensor, dtype=np.float64) - mesh.metadata.get("center_offset", 0.0)
+    normals.orient_normals(points, point_normals, pipeline_cfg.get("normals_orient", "centroid"), sensor)
+    print(f"   Normals: PCA over {min(int(pipeline_cfg.get('normals_k', 16)), len(points))} neighbours "
+          f"({time.perf_counter() - t0:.2f}s)")
+    return point_normals
+
+
+def _voxelize_points(mesh, pipeline_cfg: dict, point_normals: np.ndarray | None = None) -> trimesh.Trimesh:
+    """Points→Volume→Mesh on a sparse brick volume (voxel_backend: "python").
+    Mirrors pipeline_hd._voxelize so Blender can skip its own volume pass; with
+    point_normals the surface follows their signed tangent-plane distance instead.
+    """
+    print("   Voxelizing (sparse volume" + (", signed by normals)..." if point_normals is not None else ")..."))
+    meshed = sparse_volume.points_to_mesh(
+        np.asarray(mesh.vertices),
+        radius=float(pipeline_cfg.get("voxel_radius", 0.05)),
+        voxel_amount=int(pipeline_cfg.get("voxel_amount", 128)),
+        threshold=float(pipeline_cfg.get("volume_threshold", 0.1)),
+        normals=point_normals,
+    )
+    print(f"   Voxelized: {len(meshed.vertices)} vertices, {len(meshed.faces)} faces")
+    return meshed
+
+
+def _smooth_mesh(mesh, pipeline_cfg: dict) -> None:
+    """Taubin smoothing of the Python voxel backend's output (removes stair-stepping).
+    Only called right after that volume pass; meshes without faces are left untouched.
+    """
+    iterations = int(pipeline_cfg.get("smooth_iterations", 0))
+    faces = getattr(mesh, "faces", None)
+    if iterations <= 0 or faces is None or len(faces) == 0:
+        return
+    t0 = time.perf_counter()
+    mesh.vertices = smoothing.taubin_smooth(
+        mesh.vertices,
+        faces,
+        iterations=iterations,
+        lam=float(pipeline_cfg.get("smooth_lambda", 0.5)),
+        mu=float(pipeline_cfg.get("smooth_mu", -0.53)),
+        weights=pipeline_cfg.get("smooth_weights", "uniform"),
+    )
+    print(f"   Smoothed: {iterations} Taubin iterations ({time.perf_counter() - t0:.2f}s)")
 
-    return trimesh.PointCloud(vertices=vertices_filtered)
+
+def _optimize_order(mesh, pipeline_cfg: dict):
+    """Tipsify triangle order + first-use vertex order (mesh_order.py); point clouds pass through."""
+    faces = getattr(mesh, "faces", None)
+    if faces is None or len(faces) == 0:
+        return mesh
+    t0 = time.perf_counter()
+    cache_size = int(pipeline_cfg.get("order_cache_size", mesh_order.CACHE_SIZE))
+    before = mesh_order.acmr(faces, cache_size)
+    vertices, faces, _, _ = mesh_order.optimize(mesh.vertices, faces, cache_size)
+    after = mesh_order.acmr(faces, cache_size)
+    print(f"   Vertex cache: ACMR {before:.2f} → {after:.2f} (cache {cache_size}, {time.perf_counter() - t0:.2f}s)")
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+def _fill_holes(mesh: trimesh.Trimesh, pipeline_cfg: dict) -> tuple[trimesh.Trimesh, dict]:
+    """Close boundary loops up to max_hole_edges edges; returns the mesh and the hole report."""
+    _repair_mesh(mesh)  # merged vertices, so neighbouring faces share edge indices
+    t0 = time.perf_counter()
+    vertices, faces, report = hole_fill.fill_holes(
+        mesh.vertices, mesh.faces, int(pipeline_cfg.get("max_hole_edges", 100))
+    )
+    print(
+        f"   Holes: {report['holes_filled']}/{report['boundary_loops']} boundary loop(s) filled, "
+        f"{report['open_loops']} left open, {report['non_manifold_edges']} non-manifold edge(s) "
+        f"({time.perf_counter() - t0:.2f}s)"
+    )
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False), report
 
 
 def _repair_mesh(mesh) -> None:
@@ -133,7 +558,10 @@ def _repair_mesh(mesh) -> None:
                 valid = np.all(faces < nv, axis=1)
                 mesh.update_faces(valid)
                 mesh.remove_unreferenced_vertices()
-        mesh.remove_degenerate_faces()
+        if hasattr(mesh, "remove_degenerate_faces"):
+            mesh.remove_degenerate_faces()
+        else:  # trimesh >= 4
+            mesh.update_faces(mesh.nondegenerate_faces())
         mesh.remove_unreferenced_vertices()
 
     # Only Trimesh has process() method
@@ -141,41 +569,167 @@ def _repair_mesh(mesh) -> None:
         mesh.process()
 
 
+def _load_scan(filename: str, input_path: str, points_path: str | None):
+    """Load the scan (pre-parsed points, compressed or plain PLY). None on failure."""
+    if points_path:
+        try:
+            mesh = trimesh.PointCloud(vertices=np.load(points_path))
+        except Exception as e:
+            print(f"[FAIL] Load failed: {e}")
+            return None
+        print("   Using vertices pre-parsed during upload")
+    elif ply_stream.compression_of(filename):
+        try:
+            mesh = _load_compressed(input_path)
+        except Exception as e:
+            print(f"[FAIL] Load failed: {e}")
+            return None
+        if mesh is None:
+            print("[FAIL] No geometry found in scene.")
+            return None
+    else:
+        try:
+            scene = trimesh.load(input_path, force="scene")
+        except Exception as e:
+            print(f"[FAIL] Load failed: {e}")
+            return None
+
+        if len(scene.geometry) == 0:
+            print("[FAIL] No geometry found in scene.")
+            return None
+
+        mesh = scene.geometry[list(scene.geometry.keys())[0]]
+    return mesh
+
+
 def process_file(
     filename: str,
     input_folder: str,
     output_folder: str,
     config: dict,
+    points_path: str | None = None,
+    preview: bool = False,
 ) -> bool:
-    """Process one PLY file. Returns True on success, False on failure."""
+    """Process one PLY (optionally compressed) file. Returns True on success, False on failure.
+    points_path: vertices already decoded from the PLY during upload (.npy from
+    the ingest service); used instead of re-reading the PLY.
+    preview: downsample to preview.max_points, use preview.voxel_amount and skip
+    smoothing; writes <stem>_preview.obj.
+    """
     input_path = os.path.join(input_folder, filename)
-    output_filename = filename.replace(".ply", ".obj")
+    output_filename = ply_stream.scan_stem(filename) + ("_preview.obj" if preview else ".obj")
     output_path = os.path.join(output_folder, output_filename)
 
     print(f"Processing: {filename}")
 
-    try:
-        scene = trimesh.load(input_path, force="scene")
-    except Exception as e:
-        print(f"[FAIL] Load failed: {e}")
-        return False
-
-    if len(scene.geometry) == 0:
-        print("[FAIL] No geometry found in scene.")
+    with tracing.span("load", scan=filename):
+        mesh = _load_scan(filename, input_path, points_path)
+    if mesh is None:
         return False
-
-    mesh = scene.geometry[list(scene.geometry.keys())[0]]
     print(f"   Vertices: {len(mesh.vertices)}")
 
-    # Filter noise for point clouds (real-world scans)
+    if config.get("quality", {}).get("enable", False):
+        with tracing.span("quality gate"):
+            passed = _quality_gate(mesh, filename, output_folder, config)
+        if not passed:
+            print("[FAIL] Rejected by quality gate; skipping remaining stages.")
+            return False
+
+    pipeline_cfg = config.get("pipeline", {})
+    if preview:
+        preview_cfg = config.get("preview", {})
+        mesh = _downsample(mesh, int(preview_cfg.get("max_points", 20000)))
+        pipeline_cfg = {
+            **pipeline_cfg,
+            "voxel_amount": int(preview_cfg.get("voxel_amount", 48)),
+            "smooth_iterations": 0,
+        }
+
+    tolerance = float(config.get("filtering", {}).get("dedup_tolerance", 0.0))
+    if isinstance(mesh, trimesh.PointCloud) and tolerance > 0 and len(mesh.vertices):
+        with tracing.span("dedup", vertices=len(mesh.vertices)):
+            before = len(mesh.vertices)
+            merged, first = _dedup_points(np.asarray(mesh.vertices), tolerance)
+            # source_index maps each point back to its position in the loaded scan.
+            mesh = trimesh.PointCloud(vertices=merged, metadata={"source_index": first})
+        after = len(mesh.vertices)
+        print(f"   Dedup ({tolerance:g}): {before} → {after} points ({1 - after / before:.1%} merged, {before / after:.2f}x)")
+
+    # After dedup, so the merged cloud is what ends up in Morton order.
+    if config.get("filtering", {}).get("morton_order", False) and isinstance(mesh, trimesh.PointCloud):
+        with tracing.span("morton order", points=len(mesh.vertices)):
+            t0 = time.perf_counter()
+            order = _morton_order(np.asarray(mesh.vertices))
+            source_index = mesh.metadata.get("source_index")
+            mesh = trimesh.PointCloud(
+                vertices=np.asarray(mesh.vertices)[order],
+                metadata={"source_index": order if source_index is None else source_index[order]},
+            )
+        print(f"   Morton order: {len(order)} points ({time.perf_counter() - t0:.2f}s)")
+
+    # Filter noise for point clouds (real-world scans); meshes keep their faces
     if isinstance(mesh, trimesh.PointCloud):
-        mesh = _filter_noise(mesh, config)
+        with tracing.span("filter", vertices=len(mesh.vertices)):
+            mesh = _filter_noise(mesh, config)
+    elif isinstance(mesh, trimesh.Trimesh) and len(mesh.faces) > 0:
+        with tracing.span("filter", faces=len(mesh.faces)):
+            mesh = _filter_mesh(mesh, config)
+
+    hole_report = None
+    if pipeline_cfg.get("fill_holes", False) and isinstance(mesh, trimesh.Trimesh) and len(mesh.faces) > 0:
+        with tracing.span("fill holes", faces=len(mesh.faces)):
+            mesh, hole_report = _fill_holes(mesh, pipeline_cfg)
+    skip_voxelize = bool(
+        hole_report and hole_report["watertight"] and pipeline_cfg.get("skip_voxelize_watertight", True)
+    )
 
-    mesh.visual = trimesh.visual.ColorVisuals(mesh)
-    _repair_mesh(mesh)
+    voxelized = False
+    if pipeline_cfg.get("use_voxelization") and skip_voxelize:
+        print("[SKIP] Voxelization: mesh is watertight after hole filling")
+    elif pipeline_cfg.get("use_voxelization") and pipeline_cfg.get("voxel_backend", "blender") == "python":
+        point_normals = None
+        if pipeline_cfg.get("estimate_normals", False):
+            with tracing.span("normals"):
+                point_normals = _point_normals(mesh, pipeline_cfg)
+        with tracing.span("voxelize", points=len(mesh.vertices)):
+            mesh = _voxelize_points(mesh, pipeline_cfg, point_normals)
+        voxelized = True
 
+    mesh.visual = trimesh.visual.ColorVisuals(mesh)
+    with tracing.span("repair"):
+        _repair_mesh(mesh)
+
+    # The sidecar tells pipeline_hd.py whether it may skip its own volume pass; a
+    # stale one from an earlier run must not outlive this output.
+    report_path = hole_fill.report_path(output_path)
+    if hole_report is not None:
+        hole_report["watertight"] = hole_fill.is_watertight(mesh.faces, len(mesh.vertices))
+        hole_report["skip_voxelize"] = skip_voxelize and hole_report["watertight"]
+        print(f"   Watertight: {'yes' if hole_report['watertight'] else 'no'}")
+        with open(lease_queue.staged_path(report_path), "w", encoding="utf-8") as f:
+            json.dump(hole_report, f, indent=2)
+    elif os.path.exists(report_path):
+        os.remove(report_path)
+    if voxelized:  # with the Blender backend, pipeline_hd.py smooths after its volume pass
+        with tracing.span("smooth"):
+            _smooth_mesh(mesh, pipeline_cfg)
+    if pipeline_cfg.get("optimize_order", False):
+        with tracing.span("optimize order"):
+            mesh = _optimize_order(mesh, pipeline_cfg)
+
+    # Point normals are consumed by the Python volume pass above; Blender ignores vn
+    # lines in a face-less OBJ and voxelizes point clouds without them.
+    with_normals = pipeline_cfg.get("estimate_normals", False) and len(getattr(mesh, "faces", ())) > 0
+    if pipeline_cfg.get("estimate_normals", False) and not with_normals:
+        print('[SKIP] Normals: point-cloud output has no faces to carry them (use voxel_backend "python")')
+
+    staged_path = lease_queue.staged_path(output_path)  # published by the orchestrator under a lease
     try:
-        mesh.export(output_path)
+        with tracing.span("export", vertices=len(mesh.vertices)):
+            if with_normals:
+                mesh.export(staged_path, include_normals=True)
+            else:
+                mesh.export(staged_path)
     except Exception as e:
         print(f"[FAIL] Export failed: {e}")
         return False
@@ -184,8 +738,18 @@ def process_file(
     return True
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    """Sanitize every .ply in the incoming folder, or only the filenames given."""
+    parser = argparse.ArgumentParser(description="Rhinovate sanitizer: PLY → cleaned OBJ.")
+    parser.add_argument("files", nargs="*", help="scan filenames in the incoming folder (default: all)")
+    parser.add_argument("--points", help="pre-parsed vertices (.npy) for a single scan")
+    parser.add_argument("--preview", action="store_true", help="fast coarse pass → <stem>_preview.obj")
+    args = parser.parse_args(argv)
+    if args.points and len(args.files) != 1:
+        parser.error("--points needs exactly one scan filename")
+
     print("Rhinovate Sanitizer (one-pass)\n")
+    tracing.process_name("sanitize" + (" preview" if args.preview else ""))
 
     config = _load_config()
     folders = config.get("folders", {})
@@ -199,14 +763,14 @@ def main() -> None:
     os.makedirs(input_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
-    plies = [f for f in os.listdir(input_dir) if f.lower().endswith(".ply")]
+    plies = args.files or [f for f in os.listdir(input_dir) if ply_stream.is_scan_file(f)]
     if not plies:
         print(f"[WARN] No .ply files in '{input_folder}'. Add scans and re-run.")
         sys.exit(1)
 
     failed = []
     for f in plies:
-        if not process_file(f, input_dir, output_dir, config):
+        if not process_file(f, input_dir, output_dir, config, points_path=args.points, preview=args.preview):
             failed.append(f)
 
     if failed:
@@ -0,0 +1,109 @@
+"""
+Rhinovate mesh smoothing: Taubin λ/μ smoothing on a sparse Laplacian.
+Replaces Blender's CORRECTIVE_SMOOTH for removing voxel stair-stepping, so it
+runs right after a volume pass: in the sanitizer (Python voxel backend) and in
+pipeline_hd.py (Blender backend). The operator is built once per mesh as a SciPy
+CSR matrix; each iteration is two sparse mat-vecs over the (n, 3) vertex array.
+Blender's Python has no SciPy, so there the same operator runs as
+np.add.reduceat over the row-sorted edge list.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+except ImportError:  # Blender's bundled Python
+    sp = None
+
+
+def _edge_weights(vertices: np.ndarray, faces: np.ndarray, weights: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Directed edge list (i, j, w) for every face edge, both directions."""
+    i = faces[:, [0, 1, 2]].ravel()
+    j = faces[:, [1, 2, 0]].ravel()
+    if weights == "uniform":
+        w = np.ones(len(i), dtype=np.float32)
+    elif weights == "cotangent":
+        # Angle at the corner opposite edge (i, j) weights that edge.
+        k = faces[:, [2, 0, 1]].ravel()
+        u = vertices[i] - vertices[k]
+        v = vertices[j] - vertices[k]
+        cross = np.linalg.norm(np.cross(u, v), axis=1)
+        cot = np.einsum("ij,ij->i", u, v) / np.maximum(cross, 1e-12)
+        w = np.maximum(0.5 * cot, 0.0)  # clamp obtuse angles for a stable operator
+    else:
+        raise ValueError(f"Unknown Laplacian weights: {weights}")
+    return np.concatenate([i, j]), np.concatenate([j, i]), np.concatenate([w, w])
+
+
+def neighbor_average(vertices: np.ndarray, faces: np.ndarray, weights: str = "uniform") -> sp.csr_matrix:
+    """Row-normalized adjacency W = D⁻¹A as float32 CSR, so that L = W − I.
+
+    Duplicate edges are summed; isolated vertices get an empty row.
+    """
+    n = len(vertices)
+    rows, cols, w = _edge_weights(vertices, np.asarray(faces, dtype=np.int32), weights)
+    adj = sp.coo_matrix((w.astype(np.float32), (rows, cols)), shape=(n, n)).tocsr()
+    deg = np.asarray(adj.sum(axis=1), dtype=np.float64).ravel()
+    inv = np.divide(1.0, deg, out=np.zeros_like(deg), where=deg > 0)
+    adj.data *= np.repeat(inv, np.diff(adj.indptr)).astype(np.float32)
+    return adj
+
+
+class _EdgeAverage:
+    """neighbor_average without SciPy: `avg @ x` as np.add.reduceat over row-sorted edges."""
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray, weights: str):
+        self.n = len(vertices)
+        rows, cols, w = _edge_weights(vertices, np.asarray(faces, dtype=np.int64), weights)
+        order = np.argsort(rows, kind="stable")
+        rows, self.cols, w = rows[order], cols[order], w[order]
+        self.starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        self.present = rows[self.starts]
+        deg = np.add.reduceat(w, self.starts)
+        self.w = (w / np.repeat(np.where(deg > 0, deg, 1.0), np.diff(np.r_[self.starts, len(rows)]))).astype(np.float32)
+        self.isolated = np.ones(self.n, dtype=bool)
+        self.isolated[self.present[deg > 0]] = False
+
+    def __matmul__(self, x: np.ndarray) -> np.ndarray:
+        out = np.zeros(self.n, dtype=np.float32)
+        out[self.present] = np.add.reduceat(self.w * x[self.cols], self.starts)
+        return out
+
+
+def taubin_smooth(
+    vertices: np.ndarray,
+    faces: np.ndarray,
+    iterations: int = 10,
+    lam: float = 0.5,
+    mu: float = -0.53,
+    weights: str = "uniform",
+) -> np.ndarray:
+    """Return smoothed vertex positions; faces are unchanged.
+
+    Each iteration applies a shrinking step x += λLx then an inflating step
+    x += μLx, with μ < −λ so low frequencies are preserved and the mesh does not
+    shrink. Lx is evaluated as Wx − x with float32 sparse mat-vecs (reduceat
+    without SciPy), one per coordinate column.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+    if iterations <= 0 or len(vertices) == 0 or len(faces) == 0:
+        return vertices.copy()
+    if sp is not None:
+        avg = neighbor_average(vertices, faces, weights)
+        isolated = np.diff(avg.indptr) == 0
+    else:
+        avg = _EdgeAverage(vertices, faces, weights)
+        isolated = avg.isolated
+    # Smooth offsets from the centroid in float32; precision is ample for the deltas.
+    center = vertices.mean(axis=0)
+    cols = np.ascontiguousarray((vertices - center).T, dtype=np.float32)
+    for _ in range(iterations):
+        for factor in (lam, mu):
+            for x in cols:
+                delta = avg @ x
+                delta -= x
+                delta[isolated] = 0.0
+                x += np.float32(factor) * delta
+    return cols.T.astype(np.float64) + center
@@ -0,0 +1,402 @@
+"""
+Rhinovate sparse volume: points → density volume → mesh without a dense grid.
+Voxels live in 8³ bricks keyed by brick coordinate, so memory and time follow the
+occupied shell around the scan surface instead of voxel_amount³. Isosurfaces are
+extracted with vectorized surface nets over the occupied voxels only.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+BRICK_SIZE = 8
+_KEY_BITS = 21
+_KEY_OFFSET = 1 << (_KEY_BITS - 1)
+_KEY_MASK = (1 << _KEY_BITS) - 1
+
+# Cube corners (x, y, z) and the 12 cube edges as corner index pairs.
+_CORNERS = np.array(
+    [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0], [0, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 1]],
+    dtype=np.int64,
+)
+_EDGES = np.array(
+    [[0, 1], [2, 3], [4, 5], [6, 7], [0, 2], [1, 3], [4, 6], [5, 7], [0, 4], [1, 5], [2, 6], [3, 7]],
+    dtype=np.int64,
+)
+
+
+def pack_coords(ijk: np.ndarray) -> np.ndarray:
+    """Pack integer (N, 3) coordinates into sortable int64 keys (21 bits per axis)."""
+    ijk = np.asarray(ijk, dtype=np.int64) + _KEY_OFFSET
+    return (ijk[:, 0] << (2 * _KEY_BITS)) | (ijk[:, 1] << _KEY_BITS) | ijk[:, 2]
+
+
+def _spread_bits(x: np.ndarray) -> np.ndarray:
+    """Spread the low 21 bits of x so two zero bits follow each one (uint64)."""
+    x = x.astype(np.uint64) & np.uint64(0x1FFFFF)
+    for shift, mask in ((32, 0x1F00000000FFFF), (16, 0x1F0000FF0000FF), (8, 0x100F00F00F00F00F),
+                        (4, 0x10C30C30C30C30C3), (2, 0x1249249249249249)):
+        x = (x | (x << np.uint64(shift))) & np.uint64(mask)
+    return x
+
+
+def morton_keys(ijk: np.ndarray) -> np.ndarray:
+    """Z-order (Morton) keys of non-negative integer (N, 3) coordinates, 21 bits per axis."""
+    ijk = np.asarray(ijk)
+    return (_spread_bits(ijk[:, 0]) << np.uint64(2)) | (_spread_bits(ijk[:, 1]) << np.uint64(1)) | _spread_bits(ijk[:, 2])
+
+
+def unpack_coords(keys: np.ndarray) -> np.ndarray:
+    """Inverse of pack_coords."""
+    keys = np.asarray(keys, dtype=np.int64)
+    ijk = np.empty((len(keys), 3), dtype=np.int64)
+    ijk[:, 0] = (keys >> (2 * _KEY_BITS)) & _KEY_MASK
+    ijk[:, 1] = (keys >> _KEY_BITS) & _KEY_MASK
+    ijk[:, 2] = keys & _KEY_MASK
+    return ijk - _KEY_OFFSET
+
+
+class SparseVolume:
+    """Scalar volume stored as a hash of occupied bricks.
+
+    Voxel (i, j, k) has its center at origin + (i, j, k) * voxel_size. Unallocated
+    voxels read as zero.
+    """
+
+    def __init__(self, voxel_size: float, origin=(0.0, 0.0, 0.0), brick_size: int = BRICK_SIZE):
+        if voxel_size <= 0:
+            raise ValueError("voxel_size must be positive")
+        if brick_size & (brick_size - 1):
+            raise ValueError("brick_size must be a power of two")
+        self.voxel_size = float(voxel_size)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.brick_size = brick_size
+        self._shift = brick_size.bit_length() - 1
+        self._slots: dict[int, int] = {}
+        self._index: tuple[np.ndarray, np.ndarray] | None = None
+        self._data = np.zeros((0, brick_size, brick_size, brick_size), dtype=np.float32)
+
+    @property
+    def brick_count(self) -> int:
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        return self.brick_count * self.brick_size ** 3 * self._data.itemsize
+
+    def _lookup_slots(self, brick_keys: np.ndarray) -> np.ndarray:
+        """Slot per brick key, -1 where the brick is not allocated."""
+        if self._index is None:
+            keys = self._brick_keys()
+            order = np.argsort(keys)
+            self._index = (keys[order], order)
+        sorted_keys, order = self._index
+        if len(sorted_keys) == 0:
+            return np.full(len(brick_keys), -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(sorted_keys, brick_keys), 0, len(sorted_keys) - 1)
+        return np.where(sorted_keys[pos] == brick_keys, order[pos], -1)
+
+    def _allocate(self, brick_keys: np.ndarray) -> None:
+        """Allocate zeroed bricks for keys not yet in the hash."""
+        slots = self._slots
+        missing = [int(k) for k in np.unique(brick_keys) if int(k) not in slots]
+        if not missing:
+            return
+        needed = len(slots) + len(missing)
+        if needed > len(self._data):
+            capacity = max(needed, 2 * len(self._data), 64)
+            grown = np.zeros((capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+            grown[: len(slots)] = self._data[: len(slots)]
+            self._data = grown
+        for key in missing:
+            slots[key] = len(slots)
+        self._index = None
+
+    def _flat_index(self, ijk: np.ndarray, allocate: bool) -> np.ndarray:
+        """Flat index into the brick pool per voxel; -1 where the brick is absent."""
+        b = self.brick_size
+        brick_keys = pack_coords(ijk >> self._shift)
+        local = ijk & (b - 1)
+        local_flat = (local[:, 0] * b + local[:, 1]) * b + local[:, 2]
+        slot = self._lookup_slots(brick_keys)
+        if allocate and np.any(slot < 0):
+            self._allocate(brick_keys[slot < 0])
+            slot = self._lookup_slots(brick_keys)
+        return np.where(slot >= 0, slot * b ** 3 + local_flat, -1)
+
+    def add(self, ijk: np.ndarray, values: np.ndarray) -> None:
+        """Accumulate values into voxels (duplicates are summed)."""
+        ijk = np.asarray(ijk, dtype=np.int64).reshape(-1, 3)
+        if len(ijk) == 0:
+            return
+        flat_idx = self._flat_index(ijk, allocate=True)
+        uniq, inverse = np.unique(flat_idx, return_inverse=True)
+        sums = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64).ravel())
+        self._data.reshape(-1)[uniq] += sums.astype(self._data.dtype)
+
+    def sample(self, ijk: np.ndarray) -> np.ndarray:
+        """Read voxel values; unallocated voxels are zero."""
+        ijk = np.asarray(ijk, dtype=np.int64).reshape(-1, 3)
+        out = np.zeros(len(ijk), dtype=self._data.dtype)
+        if len(ijk) == 0 or not self._slots:
+            return out
+        flat_idx = self._flat_index(ijk, allocate=False)
+        hit = flat_idx >= 0
+        out[hit] = self._data.reshape(-1)[flat_idx[hit]]
+        return out
+
+    def _brick_keys(self) -> np.ndarray:
+        keys = np.empty(self.brick_count, dtype=np.int64)
+        for key, slot in self._slots.items():
+            keys[slot] = key
+        return keys
+
+    def splat(self, points: np.ndarray, radius: float) -> None:
+        """Splat points as Gaussian density blobs (sigma = radius / 3, cut at radius).
+
+        Points are deposited trilinearly, then blurred with three separable 1-D
+        passes over the brick hash, so cost scales with the occupied shell times
+        the kernel width rather than with points times the kernel volume.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if len(points) == 0:
+            return
+        local = (points - self.origin) / self.voxel_size
+        base = np.floor(local).astype(np.int64)
+        frac = local - base
+        ijk = (base[:, None, :] + _CORNERS[None, :, :]).reshape(-1, 3)
+        weights = np.prod(np.where(_CORNERS[None, :, :] == 1, frac[:, None, :], 1.0 - frac[:, None, :]), axis=2)
+        self.add(ijk, weights.ravel())
+
+        reach = max(1, int(np.ceil(radius / self.voxel_size)))
+        x = np.arange(-reach, reach + 1) * self.voxel_size
+        sigma = radius / 3.0
+        kernel = np.exp(-0.5 * (x / sigma) ** 2)
+        for axis in range(3):
+            self._blur_axis(axis, kernel)
+
+    def _blur_axis(self, axis: int, kernel: np.ndarray, chunk_bricks: int = 2048) -> None:
+        """Convolve along one axis; the brick set grows by the kernel reach."""
+        from scipy.ndimage import convolve1d
+
+        n = self.brick_count
+        if n == 0:
+            return
+        b = self.brick_size
+        reach = len(kernel) // 2
+        m = -(-reach // b)
+        step = np.zeros(3, dtype=np.int64)
+        step[axis] = 1
+
+        old_keys = self._brick_keys()
+        old_coords = unpack_coords(old_keys)
+        shifts = np.arange(-m, m + 1, dtype=np.int64)
+        out_keys = np.unique(pack_coords((old_coords[None, :, :] + shifts[:, None, None] * step).reshape(-1, 3)))
+        out_coords = unpack_coords(out_keys)
+
+        order = np.argsort(old_keys)
+        sorted_keys = old_keys[order]
+        table = np.empty((len(out_keys), len(shifts)), dtype=np.int64)
+        for col, shift in enumerate(shifts):
+            probe = pack_coords(out_coords + shift * step)
+            pos = np.clip(np.searchsorted(sorted_keys, probe), 0, n - 1)
+            table[:, col] = np.where(sorted_keys[pos] == probe, order[pos], n)
+
+        source = np.concatenate([self._data[:n], np.zeros((1, b, b, b), dtype=self._data.dtype)])
+        result = np.empty((len(out_keys), b, b, b), dtype=self._data.dtype)
+        for start in range(0, len(out_keys), chunk_bricks):
+            rows = table[start:start + chunk_bricks]
+            strip = np.moveaxis(source[rows], 1, 1 + axis)
+            shape = list(strip.shape)
+            shape[1 + axis:3 + axis] = [shape[1 + axis] * shape[2 + axis]]
+            strip = strip.reshape(shape)
+            strip = convolve1d(strip, kernel.astype(strip.dtype), axis=1 + axis, mode="constant")
+            center = [slice(None)] * strip.ndim
+            center[1 + axis] = slice(m * b, (m + 1) * b)
+            result[start:start + chunk_bricks] = strip[tuple(center)]
+
+        self._data = result
+        self._slots = {int(k): i for i, k in enumerate(out_keys)}
+        self._index = None
+
+    def sign_from_normals(
+        self, points: np.ndarray, normals: np.ndarray, radius: float, neighbours: int = 8, chunk_bricks: int = 128
+    ) -> None:
+        """Turn the splatted density into a signed band for extract_isosurface(band=True).
+
+        Each nonzero voxel gets 1 - s / radius, where s is the mean signed distance
+        to the tangent planes of its nearest points within radius (Hoppe et al.):
+        above 1 behind the oriented normals, below 1 in front of them. Voxels with
+        no point within radius become 0, i.e. unknown.
+        """
+        from scipy.spatial import cKDTree
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+        n = self.brick_count
+        if n == 0 or len(points) == 0:
+            return
+        tree = cKDTree(points)
+        k = min(neighbours, len(points))
+        b = self.brick_size
+        local = np.stack(np.meshgrid(*(np.arange(b),) * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+        brick_origin = unpack_coords(self._brick_keys()) << self._shift
+        for start in range(0, n, chunk_bricks):
+            block = self._data[start:min(start + chunk_bricks, n)].reshape(-1, b ** 3)
+            bi, vi = np.nonzero(block)
+            centers = self.origin + (brick_origin[start + bi] + local[vi]) * self.voxel_size
+            dist, idx = tree.query(centers, k=k, distance_upper_bound=radius, workers=-1)
+            found = np.isfinite(dist.reshape(len(centers), k))
+            idx = np.where(found, idx.reshape(len(centers), k), 0)
+            s = np.einsum("ijk,ijk->ij", centers[:, None, :] - points[idx], normals[idx])
+            count = found.sum(axis=1)
+            mean = (s * found).sum(axis=1) / np.maximum(count, 1)
+            value = np.clip(1.0 - mean / radius, 1e-3, 2.0)
+            block[bi, vi] = np.where(count > 0, value, 0.0)
+
+    def _padded_blocks(self, coords: np.ndarray) -> np.ndarray:
+        """Brick values plus one voxel of the +x/+y/+z neighbours: (n, b+1, b+1, b+1)."""
+        b = self.brick_size
+        n = self.brick_count
+        source = np.concatenate([self._data[:n], np.zeros((1, b, b, b), dtype=self._data.dtype)])
+        blocks = np.empty((len(coords), b + 1, b + 1, b + 1), dtype=self._data.dtype)
+        for corner in _CORNERS:
+            slot = self._lookup_slots(pack_coords(coords + corner))
+            slot[slot < 0] = n
+            src = tuple(slice(0, 1) if d else slice(0, b) for d in corner)
+            dst = tuple(slice(b, b + 1) if d else slice(0, b) for d in corner)
+            blocks[(slice(None),) + dst] = source[slot][(slice(None),) + src]
+        return blocks
+
+    def extract_isosurface(
+        self, threshold: float, chunk_bricks: int = 1024, band: bool = False
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Surface nets over occupied bricks. Returns (vertices, triangle faces).
+
+        Threshold must be positive: unallocated voxels read as zero (outside).
+        Bricks that are entirely inside or outside are skipped without per-voxel work.
+        band: zero voxels are unknown rather than outside, and edges touching them
+        produce no surface (a narrow band from sign_from_normals).
+        """
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        empty = (np.zeros((0, 3), dtype=np.float64), np.zeros((0, 3), dtype=np.int64))
+        if self.brick_count == 0:
+            return empty
+        b = self.brick_size
+        eye = np.eye(3, dtype=np.int64)
+        # A cell may have its min corner in an unallocated brick just below an occupied one.
+        occupied = unpack_coords(self._brick_keys())
+        candidates = unpack_coords(np.unique(pack_coords((occupied[None] - _CORNERS[:, None]).reshape(-1, 3))))
+
+        vert_keys, vert_pos, quads, flips = [], [], [], []
+        for start in range(0, len(candidates), chunk_bricks):
+            coords = candidates[start:start + chunk_bricks]
+            blocks = self._padded_blocks(coords)
+            inside = blocks > threshold
+            mixed = inside.any(axis=(1, 2, 3)) & ~inside.all(axis=(1, 2, 3))
+            if not np.any(mixed):
+                continue
+            coords, blocks, inside = coords[mixed], blocks[mixed], inside[mixed]
+            origin_ijk = coords << self._shift
+
+            corners = np.stack(
+                [blocks[:, dx:dx + b, dy:dy + b, dz:dz + b] for dx, dy, dz in _CORNERS], axis=-1
+            )
+            corner_in = corners > threshold
+            if band:
+                known = corners > 0
+                crossing = corner_in[..., _EDGES[:, 0]] != corner_in[..., _EDGES[:, 1]]
+                active = (crossing & known[..., _EDGES[:, 0]] & known[..., _EDGES[:, 1]]).any(axis=-1)
+            else:
+                active = corner_in.any(axis=-1) & ~corner_in.all(axis=-1)
+            bi, ci, cj, ck = np.nonzero(active)
+            cells = origin_ijk[bi] + np.stack([ci, cj, ck], axis=1)
+            vert_keys.append(pack_coords(cells))
+            vert_pos.append(cells + self._cell_offsets(corners[bi, ci, cj, ck].astype(np.float64), threshold, band))
+
+            core = inside[:, :b, :b, :b]
+            core_known = blocks[:, :b, :b, :b] > 0
+            for axis in range(3):
+                upper = inside[:, 1:, :b, :b] if axis == 0 else (
+                    inside[:, :b, 1:, :b] if axis == 1 else inside[:, :b, :b, 1:]
+                )
+                edge = core != upper
+                if band:
+                    shifted = blocks[:, 1:, :b, :b] if axis == 0 else (
+                        blocks[:, :b, 1:, :b] if axis == 1 else blocks[:, :b, :b, 1:]
+                    )
+                    edge &= core_known & (shifted > 0)
+                bi, ci, cj, ck = np.nonzero(edge)
+                lower = origin_ijk[bi] + np.stack([ci, cj, ck], axis=1)
+                e1, e2 = eye[(axis + 1) % 3], eye[(axis + 2) % 3]
+                quads.append(np.stack([lower - e1 - e2, lower - e2, lower, lower - e1], axis=1))
+                flips.append(~core[bi, ci, cj, ck])
+
+        if not quads:
+            return empty
+        vert_keys = np.concatenate(vert_keys)
+        vert_pos = np.concatenate(vert_pos)
+        quads = np.concatenate(quads)
+        flips = np.concatenate(flips)
+        order = np.argsort(vert_keys)
+        quad_idx = order[np.searchsorted(vert_keys[order], pack_coords(quads.reshape(-1, 3)))].reshape(-1, 4)
+        quad_idx[flips] = quad_idx[flips][:, ::-1]
+        faces = np.concatenate([quad_idx[:, [0, 1, 2]], quad_idx[:, [0, 2, 3]]])
+        return self.origin + vert_pos * self.voxel_size, faces
+
+    @staticmethod
+    def _cell_offsets(corner_vals: np.ndarray, threshold: float, band: bool = False) -> np.ndarray:
+        """Mean of the interpolated edge crossings per cell, in cell-local units."""
+        v0 = corner_vals[:, _EDGES[:, 0]]
+        v1 = corner_vals[:, _EDGES[:, 1]]
+        crossing = (v0 > threshold) != (v1 > threshold)
+        if band:
+            crossing &= (v0 > 0) & (v1 > 0)
+        denom = np.where(crossing, v1 - v0, 1.0)
+        t = np.clip(np.where(crossing, (threshold - v0) / denom, 0.0), 0.0, 1.0)
+        p0 = _CORNERS[_EDGES[:, 0]].astype(np.float64)
+        p1 = _CORNERS[_EDGES[:, 1]].astype(np.float64)
+        points = p0[None] + t[..., None] * (p1 - p0)[None]
+        n_cross = np.maximum(crossing.sum(axis=1), 1)
+        return (points * crossing[..., None]).sum(axis=1) / n_cross[:, None]
+
+
+def points_to_mesh(
+    points: np.ndarray,
+    radius: float,
+    voxel_amount: int,
+    threshold: float,
+    normals: np.ndarray | None = None,
+):
+    """Python counterpart of the Blender Points→Volume→Mesh pass.
+
+    voxel_amount follows Blender's meaning: voxels along the bounding-box diagonal.
+    With oriented per-point normals the surface is the zero level of the signed
+    distance to their tangent planes (threshold is unused): one sheet through the
+    points instead of a density shell around them.
+    Returns a trimesh.Trimesh.
+    """
+    import trimesh
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        return trimesh.Trimesh()
+    lo = points.min(axis=0) - radius
+    hi = points.max(axis=0) + radius
+    diag = float(np.linalg.norm(hi - lo))
+    voxel_size = diag / max(int(voxel_amount), 1)
+
+    volume = SparseVolume(voxel_size, origin=lo)
+    volume.splat(points, radius)
+    if normals is not None:
+        volume.sign_from_normals(points, normals, radius)
+    dense_bytes = int(np.prod(np.ceil((hi - lo) / voxel_size) + 1)) * 4
+    print(
+        f"   Sparse volume: {volume.brick_count} bricks, "
+        f"{volume.nbytes / 1e6:.1f} MB (dense grid: {dense_bytes / 1e6:.1f} MB)"
+    )
+    if normals is not None:
+        vertices, faces = volume.extract_isosurface(1.0, band=True)
+    else:
+        vertices, faces = volume.extract_isosurface(threshold)
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=True)
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import ingest_server
+import run_all
+
+CONFIG = {
+    "folders": {"incoming": "1_Incoming", "processing": "2_Processing", "outgoing": "3_Outgoing"},
+    "orchestrator": {"sanitize_workers": 1, "morph_workers": 1},
+}
+
+
+def test_stage_error_fails_job_and_frees_slot(tmp_path, monkeypatch):
+    def broken(job, ctx):
+        raise RuntimeError("sanitizer exploded")
+
+    monkeypatch.setattr(run_all, "sanitize_scan", broken)
+    ctx = run_all.make_context(str(tmp_path), CONFIG, "blender")
+
+    async def run():
+        server = ingest_server.IngestServer(ctx)
+        job = ingest_server.IngestJob(run_all.ScanJob("a.ply"))
+        server._enqueue(job)
+        await asyncio.gather(*server._tasks)
+        return server, job
+
+    server, job = asyncio.run(run())
+    server.close()
+    assert job.state == "failed"
+    assert "sanitizer exploded" in job.error
+    assert job.scan.failed_stage == "sanitize"
+    assert not server._sanitize_slots.locked()
+    assert ctx.ledger.get("a.ply", "sanitize")["state"] == "failed"
+    ctx.ledger.close()
+
+
+def test_stages_run_on_their_own_pool(tmp_path, monkeypatch):
+    threads = []
+
+    def record(job, ctx):
+        threads.append(threading.current_thread().name)
+        return True
+
+    monkeypatch.setattr(run_all, "sanitize_scan", record)
+    monkeypatch.setattr(run_all, "morph_scan", record)
+    ctx = run_all.make_context(str(tmp_path), CONFIG, "blender")
+
+    async def run():
+        server = ingest_server.IngestServer(ctx)
+        job = ingest_server.IngestJob(run_all.ScanJob("a.ply"))
+        server._enqueue(job)
+        await asyncio.gather(*server._tasks)
+        server.close()
+        return job
+
+    assert asyncio.run(run()).state == "done"
+    assert len(threads) == 2 and all(name.startswith("stage") for name in threads)
+    ctx.ledger.close()
@@ -0,0 +1,39 @@
+import json
+import os
+
+import lease_queue
+
+
+def _take_over(leases, scan):
+    """Another node replaces the lease, as a steal after expiry would."""
+    with open(os.path.join(leases.directory, scan + lease_queue.LEASE_SUFFIX), "w", encoding="utf-8") as f:
+        json.dump({"node": "other", "token": "feedface0000"}, f)
+
+
+def test_holds_notices_takeover_before_heartbeat(tmp_path):
+    leases = lease_queue.LeaseQueue(str(tmp_path / ".leases"))
+    assert leases.claim("a.ply")
+    assert leases.holds("a.ply")
+    _take_over(leases, "a.ply")
+    assert "a.ply" in leases.held
+    assert not leases.holds("a.ply")
+
+
+def test_staged_outputs_publish_and_discard(tmp_path):
+    out = tmp_path / "3_Outgoing"
+    out.mkdir()
+    (out / "a_healed.glb").write_text("new owner")
+    staged = lease_queue.staged_path(str(out / "a_healed.glb"), "0123abcd")
+    assert staged.endswith(".~0123abcd.glb")
+
+    with open(staged, "w", encoding="utf-8") as f:
+        f.write("fenced out")
+    lease_queue.discard_staged([str(out)], "0123abcd")
+    assert sorted(os.listdir(out)) == ["a_healed.glb"]
+    assert (out / "a_healed.glb").read_text() == "new owner"
+
+    with open(staged, "w", encoding="utf-8") as f:
+        f.write("ours")
+    assert lease_queue.publish_staged([str(out)], "0123abcd") == 1
+    assert sorted(os.listdir(out)) == ["a_healed.glb"]
+    assert (out / "a_healed.glb").read_text() == "ours"
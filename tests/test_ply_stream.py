@@ -0,0 +1,48 @@
+import gzip
+
+import numpy as np
+import pytest
+
+import ply_stream
+
+ROWS = 50
+
+
+def _ascii_ply(newline: str) -> bytes:
+    header = [
+        "ply", "format ascii 1.0", f"element vertex {ROWS}",
+        "property float x", "property float y", "property float z",
+        "element face 1", "property list uchar int vertex_indices", "end_header",
+    ]
+    rows = [f"{i + 0.5} {-i - 0.25} {2 * i}" for i in range(ROWS)]
+    return newline.join(header + rows + ["3 0 1 2", ""]).encode("ascii")
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1000])
+def test_ascii_rows_split_across_chunks(newline, chunk):
+    data = _ascii_ply(newline)
+    parser = ply_stream.PlyStreamParser()
+    for start in range(0, len(data), chunk):
+        parser.feed(data[start:start + chunk])
+    vertices = parser.finish()
+    expected = np.array([[i + 0.5, -i - 0.25, 2 * i] for i in range(ROWS)])
+    assert np.array_equal(vertices, expected)
+    assert parser.has_faces
+
+
+def test_compressed_mesh_stops_after_header(tmp_path):
+    path = tmp_path / "mesh.ply.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(_ascii_ply("\n"))
+    parser = ply_stream.parse_file(str(path))
+    assert parser.has_faces
+    assert parser.vertices_seen == 0
+
+    path = tmp_path / "cloud.ply.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(_ascii_ply("\n").replace(b"element face 1\n", b"").replace(
+            b"property list uchar int vertex_indices\n", b"").replace(b"3 0 1 2\n", b""))
+    parser = ply_stream.parse_file(str(path))
+    assert not parser.has_faces
+    assert len(parser.finish()) == ROWS
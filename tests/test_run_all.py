@@ -0,0 +1,124 @@
+import copy
+import json
+import os
+import sys
+
+import lease_queue
+import run_all
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG = {
+    "folders": {"incoming": "1_Incoming", "processing": "2_Processing", "outgoing": "3_Outgoing"},
+    "filtering": {"enable": True, "k_neighbors": 20},
+    "pipeline": {"use_voxelization": False, "smooth_iterations": 0, "lattice_resize_x": 0.8, "sweep": []},
+}
+
+
+def _copy_stage_cmd(src: str, dst: str) -> list[str]:
+    """A stand-in stage child that copies its input to its (staged, under a lease) output."""
+    code = (
+        f"import shutil, sys; sys.path.insert(0, {REPO!r}); import lease_queue; "
+        f"shutil.copy({src!r}, lease_queue.staged_path({dst!r}))"
+    )
+    return [sys.executable, "-c", code]
+
+
+def _run(ctx, job, stage, src, dst):
+    return run_all._run_stage(job, stage, _copy_stage_cmd(src, dst), ctx, src, dst)
+
+
+def test_morph_only_change_skips_sanitize(tmp_path):
+    root = str(tmp_path)
+    config = copy.deepcopy(CONFIG)
+    ctx = run_all.make_context(root, config, "blender")
+    scan = os.path.join(ctx.dirs["incoming"], "a.ply")
+    obj = os.path.join(ctx.dirs["processing"], "a.obj")
+    glb = os.path.join(ctx.dirs["outgoing"], "a_healed.glb")
+    with open(scan, "w") as f:
+        f.write("ply\n")
+
+    job = run_all.ScanJob("a.ply")
+    assert _run(ctx, job, "sanitize", scan, obj)
+    assert _run(ctx, job, "morph", obj, glb)
+    assert job.stage_times["sanitize"] > 0 and job.stage_times["morph"] > 0
+
+    ctx.config["pipeline"]["lattice_resize_x"] = 0.7
+    ctx.config["pipeline"]["sweep"] = [{"name": "mild", "lattice_resize_x": 0.9}]
+    job = run_all.ScanJob("a.ply")
+    assert _run(ctx, job, "sanitize", scan, obj)
+    assert _run(ctx, job, "morph", obj, glb)
+    assert job.stage_times["sanitize"] == 0.0  # skipped by the ledger
+    assert job.stage_times["morph"] > 0
+
+    ctx.config["pipeline"]["smooth_iterations"] = 3
+    job = run_all.ScanJob("a.ply")
+    assert _run(ctx, job, "sanitize", scan, obj)
+    assert job.stage_times["sanitize"] > 0
+    ctx.ledger.close()
+
+
+def test_sanitize_hash_ignores_blender_only_keys():
+    a = copy.deepcopy(CONFIG)
+    b = json.loads(json.dumps(a))
+    b["pipeline"].update(lattice_points=5, lattice_brush_factor=0.5)
+    sections = run_all.STAGE_CONFIG_SECTIONS
+    assert run_all.job_ledger.config_hash(a, sections["sanitize"]) == run_all.job_ledger.config_hash(b, sections["sanitize"])
+    assert run_all.job_ledger.config_hash(a, sections["morph"]) != run_all.job_ledger.config_hash(b, sections["morph"])
+
+
+def test_lost_lease_discards_stage_outputs(tmp_path):
+    root = str(tmp_path)
+    ctx = run_all.make_context(root, copy.deepcopy(CONFIG), "blender")
+    ctx.leases = lease_queue.LeaseQueue(os.path.join(root, ".leases"))
+    scan = os.path.join(ctx.dirs["incoming"], "a.ply")
+    obj = os.path.join(ctx.dirs["processing"], "a.obj")
+    glb = os.path.join(ctx.dirs["outgoing"], "a_healed.glb")
+    with open(scan, "w") as f:
+        f.write("ply\n")
+    assert ctx.leases.claim("a.ply")
+
+    job = run_all.ScanJob("a.ply")
+    assert _run(ctx, job, "sanitize", scan, obj)
+    assert os.listdir(ctx.dirs["processing"]) == ["a.obj"]  # published under its final name
+
+    with open(os.path.join(root, ".leases", "a.ply.lease"), "w") as f:
+        json.dump({"node": "other", "token": "feedface0000"}, f)
+    assert not _run(ctx, job, "morph", obj, glb)
+    assert job.failed_stage == "morph"
+    assert os.listdir(ctx.dirs["outgoing"]) == []
+    ctx.ledger.close()
+
+
+def test_stage_exception_fails_one_scan_not_the_batch(tmp_path, monkeypatch, capsys):
+    root = str(tmp_path)
+    with open(os.path.join(root, "config.json"), "w") as f:
+        json.dump(CONFIG, f)
+    incoming = os.path.join(root, "1_Incoming")
+    os.makedirs(incoming)
+    cloud = "\n".join(f"{i % 7} {i % 5} {i % 3}" for i in range(60))
+    for name in ("a.ply", "bad.ply"):
+        with open(os.path.join(incoming, name), "w") as f:
+            f.write("ply\nformat ascii 1.0\nelement vertex 60\nproperty float x\nproperty float y\n"
+                    f"property float z\nend_header\n{cloud}\n")
+    file_hash = run_all.job_ledger.file_hash
+
+    def vanishing(path, *args):
+        if path.endswith("bad.ply"):
+            raise FileNotFoundError(path)
+        return file_hash(path, *args)
+
+    monkeypatch.setattr(run_all.job_ledger, "file_hash", vanishing)
+    monkeypatch.chdir(root)
+    try:
+        run_all.main(["--root", root, "--blender", os.path.join(REPO, "blender_standin.py")])
+    except SystemExit as e:
+        assert e.code == 1
+    out = capsys.readouterr().out
+    assert "[bad.ply] [FAIL] sanitize raised FileNotFoundError" in out
+    assert "PIPELINE FINISHED WITH FAILURES: bad.ply" in out
+    assert os.path.isfile(os.path.join(root, "3_Outgoing", "a_healed.glb"))
+    ledger = run_all.job_ledger.JobLedger(run_all.job_ledger.ledger_path(root, CONFIG))
+    assert ledger.get("bad.ply", "sanitize")["state"] == "failed"
+    assert ledger.get("a.ply", "morph")["state"] == "done"
+    ledger.close()
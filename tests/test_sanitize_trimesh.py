@@ -0,0 +1,104 @@
+import numpy as np
+import trimesh
+
+import sanitize_trimesh
+import sparse_volume
+
+TOLERANCE = 0.01
+
+
+def _scan(n=5000, seed=0):
+    """Shuffled capture-order points, every one duplicated within the dedup tolerance."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(-1.0, 1.0, size=(n, 3))
+    cells = (np.floor(points / TOLERANCE) + 0.5) * TOLERANCE  # well inside a cell
+    twins = cells + rng.uniform(-0.2, 0.2, size=cells.shape) * TOLERANCE
+    scan = np.vstack([cells, twins])
+    return scan[rng.permutation(len(scan))]
+
+
+def _morton_keys(vertices):
+    lo = vertices.min(axis=0)
+    scale = ((1 << 21) - 1) / float((vertices.max(axis=0) - lo).max())
+    return sparse_volume.morton_keys(((vertices - lo) * scale).astype(np.int64))
+
+
+def test_dedup_keeps_first_occurrence_order():
+    scan = _scan()
+    merged, first = sanitize_trimesh._dedup_points(scan, TOLERANCE)
+    assert np.all(np.diff(first) > 0)
+    assert np.abs(merged - scan[first]).max() <= TOLERANCE
+
+
+def test_dedup_then_morton_is_fully_ordered(tmp_path):
+    scan = _scan()
+    np.save(tmp_path / "scan.npy", scan)
+    config = {"filtering": {"enable": False, "dedup_tolerance": TOLERANCE, "morton_order": True}, "pipeline": {}}
+    assert sanitize_trimesh.process_file("scan.ply", str(tmp_path), str(tmp_path), config, str(tmp_path / "scan.npy"))
+
+    merged, first = sanitize_trimesh._dedup_points(scan, TOLERANCE)
+    order = sanitize_trimesh._morton_order(merged)
+    assert np.all(np.diff(_morton_keys(merged[order]).astype(np.int64)) >= 0)
+
+    with open(tmp_path / "scan.obj", "r", encoding="utf-8") as f:
+        written = np.array([line.split()[1:4] for line in f if line.startswith("v ")], dtype=np.float64)
+    assert len(written) == len(scan) // 2
+    assert np.allclose(written, merged[order], atol=1e-6)
+
+
+def test_source_index_survives_dedup_and_morton():
+    scan = _scan(seed=1)
+    merged, first = sanitize_trimesh._dedup_points(scan, TOLERANCE)
+    order = sanitize_trimesh._morton_order(merged)
+    cloud = trimesh.PointCloud(vertices=merged[order], metadata={"source_index": first[order]})
+    filtered = sanitize_trimesh._filter_noise(cloud, {"filtering": {"stages": ["roi_crop"], "roi_min_points": 10}})
+    source_index = filtered.metadata["source_index"]
+    restored = np.asarray(filtered.vertices) + filtered.metadata["center_offset"]
+    assert np.abs(restored - scan[source_index]).max() <= TOLERANCE
+
+
+def _filtered(mesh):
+    return sanitize_trimesh._filter_mesh(mesh.copy(), {"filtering": {"enable": True}})
+
+
+def test_filter_mesh_leaves_clean_meshes_unchanged():
+    noisy = trimesh.creation.icosphere(subdivisions=5, radius=0.1)
+    noisy.vertices += np.random.default_rng(0).normal(0.0, 0.004, noisy.vertices.shape)
+    for mesh in (noisy, trimesh.creation.capsule()):
+        assert mesh.is_watertight
+        out = _filtered(mesh)
+        assert len(out.faces) == len(mesh.faces)
+        assert out.is_watertight
+
+
+def test_filter_mesh_drops_debris_and_its_bridge():
+    surface = trimesh.creation.icosphere(subdivisions=4)
+    debris = trimesh.creation.icosphere(subdivisions=1, radius=0.05)
+    debris.apply_translation([3.0, 0.0, 0.0])
+    mesh = trimesh.util.concatenate([surface, debris])
+    # A long sliver joining the surface to the debris, sharing an edge with each.
+    a, b = surface.faces[0][:2]
+    c = len(surface.vertices) + debris.faces[0][0]
+    d = len(surface.vertices) + debris.faces[0][1]
+    mesh = trimesh.Trimesh(mesh.vertices, np.vstack([mesh.faces, [[b, a, c], [c, d, b]]]), process=False)
+    out = _filtered(mesh)
+    assert len(out.faces) == len(surface.faces)
+    assert out.is_watertight
+
+
+def test_normals_give_one_sheet_through_the_points(tmp_path):
+    rng = np.random.default_rng(0)
+    sphere = rng.normal(size=(40000, 3))
+    sphere /= np.linalg.norm(sphere, axis=1, keepdims=True)
+    np.save(tmp_path / "sphere.npy", sphere + rng.normal(0.0, 0.002, sphere.shape))
+    pipeline = {"use_voxelization": True, "voxel_backend": "python", "voxel_radius": 0.05, "voxel_amount": 96}
+    for name, estimate in (("shell", False), ("sheet", True)):
+        config = {"filtering": {"enable": False}, "pipeline": {**pipeline, "estimate_normals": estimate}}
+        assert sanitize_trimesh.process_file(f"{name}.ply", str(tmp_path), str(tmp_path), config, str(tmp_path / "sphere.npy"))
+    shell = trimesh.load(tmp_path / "shell.obj", force="mesh")
+    sheet = trimesh.load(tmp_path / "sheet.obj", force="mesh")
+    # The density shell wraps the points on both sides; the signed sheet passes through them.
+    assert np.abs(np.linalg.norm(shell.vertices, axis=1) - 1.0).max() > 0.03
+    assert np.abs(np.linalg.norm(sheet.vertices, axis=1) - 1.0).max() < 0.01
+    assert len(sheet.faces) < 0.6 * len(shell.faces)
+    assert abs(sheet.volume - 4.0 / 3.0 * np.pi) < 0.05
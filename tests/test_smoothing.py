@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+import trimesh
+
+import smoothing
+
+
+@pytest.mark.parametrize("weights", ["uniform", "cotangent"])
+def test_numpy_operator_matches_sparse(weights, monkeypatch):
+    sphere = trimesh.creation.icosphere(subdivisions=3)
+    noisy = sphere.vertices + np.random.default_rng(0).normal(0.0, 0.01, sphere.vertices.shape)
+    noisy = np.vstack([noisy, [5.0, 5.0, 5.0]])  # an isolated vertex stays put
+    sparse = smoothing.taubin_smooth(noisy, sphere.faces, iterations=5, weights=weights)
+    monkeypatch.setattr(smoothing, "sp", None)  # as in Blender's Python
+    dense = smoothing.taubin_smooth(noisy, sphere.faces, iterations=5, weights=weights)
+    assert np.abs(sparse - dense).max() < 1e-5
+    assert np.allclose(dense[-1], noisy[-1])
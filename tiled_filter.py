@@ -0,0 +1,225 @@
+"""
+Rhinovate tiled noise filter: statistical outlier removal and DBSCAN over spatial tiles.
+The bounding box is cut into blocks; each block plus a halo of neighbouring points is
+processed in a worker process, so one large scan uses every core. Vertices and the
+per-point results live in multiprocessing.shared_memory blocks, so workers receive
+only the block bounds and the shared-memory names, never pickled point arrays.
+
+SOR is exact: every point's k-NN distances come from its own block plus halo, and
+the global mean/std threshold is taken in the parent. Clusters are stitched by
+union of local labels that share a point in the halo overlap, then the largest
+global cluster is kept, as in the sanitizer's serial "sor" + "cluster" filter stages.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class _Shared:
+    """Named shared-memory arrays created by the parent, attached by workers."""
+
+    def __init__(self):
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self.specs: dict[str, tuple[str, tuple, str]] = {}
+
+    def create(self, key: str, shape: tuple, dtype, fill=None) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        self._blocks.append(shm)
+        self.specs[key] = (shm.name, shape, dtype.str)
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if fill is not None:
+            arr[...] = fill
+        return arr
+
+    def close(self) -> None:
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+
+
+def _attach(specs: dict) -> tuple[list[shared_memory.SharedMemory], dict[str, np.ndarray]]:
+    blocks, arrays = [], {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        blocks.append(shm)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return blocks, arrays
+
+
+def _tile_bounds(lo: np.ndarray, hi: np.ndarray, tiles: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Split the box into roughly cubic blocks, about `tiles` of them."""
+    extent = np.maximum(hi - lo, 1e-12)
+    edge = (float(np.prod(extent)) / tiles) ** (1.0 / 3.0)
+    counts = np.maximum(1, np.round(extent / edge)).astype(int)
+    steps = extent / counts
+    bounds = []
+    for i in range(counts[0]):
+        for j in range(counts[1]):
+            for k in range(counts[2]):
+                idx = np.array([i, j, k])
+                t_lo = lo + idx * steps
+                t_hi = np.where(idx == counts - 1, np.inf, lo + (idx + 1) * steps)
+                t_lo = np.where(idx == 0, -np.inf, t_lo)
+                bounds.append((t_lo, t_hi))
+    return bounds
+
+
+def _select(vertices: np.ndarray, t_lo: np.ndarray, t_hi: np.ndarray, halo: float) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of points in the block plus halo, and which of them are the block's own."""
+    region = np.all((vertices >= t_lo - halo) & (vertices < t_hi + halo), axis=1)
+    idx = np.flatnonzero(region)
+    own = np.all((vertices[idx] >= t_lo) & (vertices[idx] < t_hi), axis=1)
+    return idx, own
+
+
+def _sor_tile(specs: dict, tile: int, t_lo: np.ndarray, t_hi: np.ndarray, halo: float, k: int) -> int:
+    """Mean k-NN distance and 1-NN distance for the block's own points.
+
+    A point whose k-th distance reaches past block + halo (sparse clutter) may have
+    closer neighbours outside the region; those few are re-queried against every
+    point within their found k-th distance, which is an upper bound, so the result
+    is exact. Returns how many points needed that.
+    """
+    from scipy.spatial import cKDTree
+
+    blocks, arr = _attach(specs)
+    try:
+        vertices = arr["vertices"]
+        idx, own = _select(vertices, t_lo, t_hi, halo)
+        if not own.any():
+            return 0
+        pts = vertices[idx]
+        own_pts = pts[own]
+        kq = min(k + 1, len(vertices))
+        dist, _ = cKDTree(pts).query(own_pts, k=min(kq, len(pts)))
+        dist = dist.reshape(len(own_pts), -1)
+        to_face = np.minimum((own_pts - t_lo).min(axis=1), (t_hi - own_pts).min(axis=1))
+        bad = (dist[:, -1] > to_face + halo) | (dist.shape[1] < kq)
+        if bad.any():
+            far = own_pts[bad]
+            reach = dist[bad, -1].max() if dist.shape[1] == kq else np.inf
+            wide = np.all((vertices >= far.min(axis=0) - reach) & (vertices <= far.max(axis=0) + reach), axis=1)
+            exact, _ = cKDTree(vertices[wide]).query(far, k=kq)
+            dist = dist if dist.shape[1] == kq else np.full((len(own_pts), kq), np.inf)
+            dist[bad] = exact.reshape(len(far), -1)
+        target = idx[own]
+        arr["tile"][target] = tile
+        arr["mean_dist"][target] = dist[:, 1:].mean(axis=1) if kq > 1 else np.inf
+        arr["nn_dist"][target] = dist[:, 1] if kq > 1 else np.inf
+        return int(bad.sum())
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+def _cluster_tile(specs: dict, t_lo: np.ndarray, t_hi: np.ndarray, halo: float, eps: float, min_samples: int):
+    """DBSCAN on kept points of block + halo. Own points' labels go to shared memory;
+    (point, label) pairs for halo points are returned for stitching."""
+    from sklearn.cluster import DBSCAN
+
+    blocks, arr = _attach(specs)
+    try:
+        vertices, keep = arr["vertices"], arr["keep"]
+        idx, own = _select(vertices, t_lo, t_hi, halo)
+        kept = keep[idx]
+        idx, own = idx[kept], own[kept]
+        if not own.any():
+            return np.empty(0, np.int64), np.empty(0, np.int64), 0
+        labels = DBSCAN(eps=eps, min_samples=min_samples).fit(vertices[idx]).labels_.astype(np.int64)
+        arr["labels"][idx[own]] = labels[own]
+        halo_pts = ~own & (labels >= 0)
+        return idx[halo_pts], labels[halo_pts], int(labels.max()) + 1
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+def filter_mask(vertices: np.ndarray, filter_config: dict, active: np.ndarray | None = None) -> np.ndarray:
+    """SOR + largest DBSCAN cluster over tiles in a process pool.
+
+    Filters vertices[active] (all vertices when active is None), gathered straight
+    into shared memory. Returns a boolean keep mask over those points.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.spatial import cKDTree
+
+    k = int(filter_config.get("k_neighbors", 20))
+    std_ratio = float(filter_config.get("std_ratio", 2.0))
+    tiles = int(filter_config.get("tiles", 8))
+    workers = int(filter_config.get("tile_workers") or os.cpu_count() or 1)
+    n = len(vertices) if active is None else len(active)
+
+    shared = _Shared()
+    try:
+        points = shared.create("vertices", (n, 3), np.float64)
+        if active is None:
+            points[...] = vertices
+        else:
+            np.take(vertices, active, axis=0, out=points)
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        bounds = _tile_bounds(lo, hi, tiles)
+
+        # Halo from a random subsample's typical k-NN spacing, scaled to full density
+        # (scan points lie on a surface, so spacing goes with 1/sqrt(density)). Points
+        # sparser than that are handled exactly in _sor_tile.
+        rng = np.random.default_rng(0)
+        s = min(n, 20000)
+        sample = points[rng.choice(n, size=s, replace=False)]
+        sample_k, _ = cKDTree(sample).query(sample, k=min(k + 1, s))
+        halo = float(filter_config.get("tile_halo") or 3.0 * np.median(sample_k[:, -1]) * np.sqrt(s / n))
+
+        mean_dist = shared.create("mean_dist", (n,), np.float64, np.inf)
+        nn_dist = shared.create("nn_dist", (n,), np.float64, np.inf)
+        keep = shared.create("keep", (n,), np.bool_, False)
+        labels = shared.create("labels", (n,), np.int64, -1)
+        own_tile = shared.create("tile", (n,), np.int64, 0)
+
+        print(f"   Tiled filter: {len(bounds)} tiles, halo {halo:.4g}, {workers} worker(s)")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            widened = sum(pool.map(_sor_tile, *zip(*[(shared.specs, t, *b, halo, k) for t, b in enumerate(bounds)])))
+            if widened:
+                print(f"   Tiled filter: {widened} sparse point(s) re-queried beyond the halo")
+
+            threshold = mean_dist.mean() + std_ratio * mean_dist.std()
+            keep[:] = mean_dist < threshold
+            print(f"   After outlier removal: {int(keep.sum())} vertices")
+
+            if not filter_config.get("keep_largest_cluster", True) or keep.sum() <= 100:
+                return keep.copy()  # the shared block is unlinked on return
+
+            # Same adaptive eps as the serial path (approximated from the SOR pass).
+            eps = 3.0 * float(nn_dist[keep].mean())
+            cluster_halo = max(halo, 2.0 * eps)
+            results = list(pool.map(
+                _cluster_tile,
+                *zip(*[(shared.specs, t_lo, t_hi, cluster_halo, eps, 10) for t_lo, t_hi in bounds]),
+            ))
+
+        # Stitch: local label → global id; a point labelled in two tiles joins their clusters.
+        offsets = np.cumsum([0] + [r[2] for r in results])
+        global_labels = np.where(labels >= 0, labels + offsets[own_tile], -1)
+        pairs = [
+            np.stack([global_labels[pts], lab + offsets[t]], axis=1)
+            for t, (pts, lab, _) in enumerate(results) if len(pts)
+        ]
+        total = int(offsets[-1])
+        if total == 0:
+            return keep.copy()
+        edges = np.concatenate(pairs) if pairs else np.empty((0, 2), np.int64)
+        edges = edges[edges[:, 0] >= 0]
+        graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(total, total))
+        _, merged = connected_components(graph, directed=False)
+        final = np.where(global_labels >= 0, merged[np.maximum(global_labels, 0)], -1)
+        counts = np.bincount(final[final >= 0])
+        mask = final == int(np.argmax(counts))
+        print(f"   After cluster filtering: {int(mask.sum())} vertices (largest cluster, stitched across tiles)")
+        return mask
+    finally:
+        shared.close()
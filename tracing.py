@@ -0,0 +1,110 @@
+"""
+Rhinovate tracing: spans from the orchestrator, sanitizer and Blender stage in one timeline.
+Each process appends Chrome trace events ("X" complete events, wall-clock µs) to
+<trace dir>/<trace id>/<pid>.jsonl. The trace id and directory are passed to stage
+children via RHINOVATE_TRACE_ID / RHINOVATE_TRACE_DIR; without them span() is a no-op.
+merge() combines one run's files into a trace-event JSON for chrome://tracing / Perfetto.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENV_ID = "RHINOVATE_TRACE_ID"
+ENV_DIR = "RHINOVATE_TRACE_DIR"
+ENV_SPAWN = "RHINOVATE_TRACE_SPAWN"  # parent's wall clock when it started this process
+
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(os.environ.get(ENV_ID) and os.environ.get(ENV_DIR))
+
+
+def _now_us() -> float:
+    return time.time() * 1e6
+
+
+def _emit(event: dict) -> None:
+    run_dir = os.path.join(os.environ[ENV_DIR], os.environ[ENV_ID])
+    line = json.dumps(event) + "\n"
+    with _lock:
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, f"{os.getpid()}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _complete(name: str, start_us: float, end_us: float, args: dict) -> None:
+    _emit({
+        "name": name,
+        "cat": "rhinovate",
+        "ph": "X",
+        "ts": start_us,
+        "dur": max(0.0, end_us - start_us),
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "args": args,
+    })
+
+
+@contextmanager
+def span(name: str, **args):
+    """Record the enclosed block as one span (no-op when tracing is off)."""
+    if not enabled():
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    finally:
+        _complete(name, start, _now_us(), args)
+
+
+def process_name(name: str) -> None:
+    """Label this process in the trace viewer. Also records a "startup" span
+    from the parent's spawn time, covering interpreter start and imports."""
+    if not enabled():
+        return
+    _emit({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"{name} ({os.getpid()})"}})
+    spawned = os.environ.get(ENV_SPAWN)
+    if spawned:
+        _complete("startup", float(spawned) * 1e6, _now_us(), {})
+
+
+def start_run(trace_dir: str) -> str:
+    """Begin a traced run in this process; children inherit it through the environment."""
+    trace_id = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+    os.environ[ENV_DIR] = trace_dir
+    os.environ[ENV_ID] = trace_id
+    return trace_id
+
+
+def child_env(env: dict) -> dict:
+    """env for a stage child, stamped with the spawn time."""
+    if not enabled():
+        return env
+    return {**env, ENV_SPAWN: repr(time.time())}
+
+
+def merge(trace_dir: str, trace_id: str) -> str | None:
+    """Merge all per-process files of a run into <trace_dir>/<trace_id>.json; returns its path."""
+    events = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, trace_id, "*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # a process killed mid-write
+    if not events:
+        return None
+    out_path = os.path.join(trace_dir, trace_id + ".json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace_id}}, f)
+    return out_path
@@ -0,0 +1,102 @@
+"""
+Rhinovate voxel cache: on-disk cache of voxelized meshes for the Blender stage.
+Entries are keyed by the sanitized input's hash plus the voxel parameters, so a
+rerun that only changes lattice settings reuses the Points→Volume→Mesh result.
+The cache is bounded by entry count and total size (least recently used first).
+Plain Python (no bpy) so it can be used and inspected outside Blender.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+VOXEL_KEYS = ("voxel_radius", "voxel_amount", "volume_threshold", "volume_adaptivity")
+_FORMAT_VERSION = 1
+_SUFFIX = ".obj"
+
+
+def cache_key(input_path: str, pipeline_cfg: dict) -> str:
+    """Hash of the input mesh bytes and the parameters that shape the voxel pass."""
+    h = hashlib.sha256()
+    with open(input_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    params = {k: pipeline_cfg.get(k) for k in VOXEL_KEYS}
+    h.update(json.dumps({"v": _FORMAT_VERSION, "params": params}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class VoxelCache:
+    def __init__(self, directory: str, max_entries: int = 32, max_bytes: int = 2 << 30):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def lookup(self, key: str) -> str | None:
+        """Cached mesh path, or None. A hit refreshes the entry's LRU time."""
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return None
+        os.utime(path)
+        return path
+
+    def staging_path(self, key: str) -> str:
+        """Where to write a new entry before commit(); keeps readers off partial files."""
+        return self.path_for(key) + f".{os.getpid()}.tmp"
+
+    def commit(self, key: str) -> str:
+        """Publish a staged entry atomically, then evict down to the limits."""
+        path = self.path_for(key)
+        os.replace(self.staging_path(key), path)
+        self.evict(keep=path)
+        return path
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep: str | None = None) -> int:
+        """Delete least recently used entries beyond max_entries / max_bytes. Returns count removed."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        removed = 0
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+            removed += 1
+        return removed
+
+
+def from_config(project_root: str, config: dict) -> VoxelCache | None:
+    """Cache configured by the "cache" section, or None when disabled."""
+    cfg = config.get("cache", {})
+    if not cfg.get("enable", True):
+        return None
+    return VoxelCache(
+        os.path.join(project_root, cfg.get("voxel_dir", os.path.join(".cache", "voxel"))),
+        max_entries=int(cfg.get("voxel_max_entries", 32)),
+        max_bytes=int(float(cfg.get("voxel_max_mb", 2048)) * (1 << 20)),
+    )